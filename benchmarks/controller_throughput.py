@@ -0,0 +1,124 @@
+"""Measure controller API throughput (actions/sec) under concurrent clients.
+
+By default the controller app is served in-process by uvicorn with stand-in
+capture and input backends (see benchmarks.latency_breakdown), so the numbers
+reflect server and ComputerTool overhead rather than X or xdotool. Pass --url
+to load a running controller instead, e.g. a container's published port 5000.
+
+Example:
+    python -m benchmarks.controller_throughput --concurrency 32 --requests 2000
+    python -m benchmarks.controller_throughput --url http://127.0.0.1:5000 --action screenshot
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+# GET endpoints are read-only; POST actions go through the per-display action lock
+WORKLOADS = {
+    "cursor_position": ("POST", "/perform_action", {"action": "cursor_position"}),
+    "left_click": ("POST", "/perform_action", {"action": "left_click"}),
+    "screenshot": ("GET", "/screenshot", {"format": "raw"}),
+    "healthz": ("GET", "/healthz", None),
+}
+
+
+def serve_in_process(args):
+    from PIL import Image
+
+    from benchmarks.latency_breakdown import NullInput, StaticCapture, serve
+
+    os.environ.setdefault("WIDTH", str(args.width))
+    os.environ.setdefault("HEIGHT", str(args.height))
+    os.environ.setdefault("CAPTURE_BACKEND", "scrot")
+    os.environ.setdefault("INPUT_BACKEND", "xdotool")
+    import api
+
+    frame = Image.open(args.image).convert("RGB").resize((args.width, args.height))
+    api.computer_tool._capture = StaticCapture(frame)
+    api.computer_tool._input = NullInput()
+    api.computer_tool.settle_quiet_window = args.quiet_window
+
+    server, port = serve(api.app, args.port)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def load(url, workload, concurrency, total):
+    method, path, payload = WORKLOADS[workload]
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async with httpx.AsyncClient(
+        base_url=url,
+        timeout=60,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    ) as client:
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                if method == "POST":
+                    response = await client.post(path, json=payload)
+                else:
+                    response = await client.get(path, params=payload)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "actions_per_second": round(total / elapsed, 1),
+        "latency_ms": {
+            "median": round(statistics.median(latencies_ms), 3),
+            "p90": round(latencies_ms[int(0.9 * (len(latencies_ms) - 1))], 3),
+            "max": round(latencies_ms[-1], 3),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="controller to load instead of an in-process one")
+    parser.add_argument("--action", choices=sorted(WORKLOADS), default="cursor_position")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=None, help="port for the in-process controller")
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=768)
+    parser.add_argument("--quiet-window", type=float, default=0.0, help="settle quiet window for in-process runs")
+    parser.add_argument("--image", default="test_files/test_3_0.png")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = serve_in_process(args)
+
+    result = asyncio.run(load(url, args.action, args.concurrency, args.requests))
+    if server is not None:
+        server.should_exit = True
+
+    print(json.dumps({
+        "url": url,
+        "action": args.action,
+        "concurrency": args.concurrency,
+        **result,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Measure ShowUI-2B grounding latency for a device/dtype/thread/quantization setting.
+
+Example:
+    python -m benchmarks.cpu_latency --device cpu --dtype bfloat16 --threads 16
+    python -m benchmarks.cpu_latency --device cpu --quantization int8 --threads 16
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from PIL import Image
+
+from framework.framework import Framework
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--dtype", default="bfloat16")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--quantization", choices=["int8"], default=None)
+    parser.add_argument("--image", default="test_files/test_3_0.png")
+    parser.add_argument("--query", default="Find the firefox icon")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--prefix-cache", action="store_true", help="reuse the image prefix across runs")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    framework = Framework(
+        device=args.device,
+        dtype=args.dtype,
+        num_threads=args.threads,
+        quantization=args.quantization,
+        cache_size=0,
+        prefix_cache_frames=1 if args.prefix_cache else 0,
+    )
+    # Loading is lazy, so load explicitly to keep it out of the warm-up
+    framework.vision.load()
+    load_seconds = time.perf_counter() - started
+
+    image = Image.open(args.image).convert("RGB")
+    framework.ground(image, args.query)  # warm-up
+
+    latencies = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        framework.ground(image, args.query)
+        latencies.append(time.perf_counter() - started)
+
+    print(json.dumps({
+        "device": args.device,
+        "dtype": args.dtype,
+        "threads": args.threads,
+        "quantization": args.quantization,
+        "prefix_cache": args.prefix_cache,
+        "load_seconds": round(load_seconds, 3),
+        "runs": args.runs,
+        "latency_seconds": {
+            "min": round(min(latencies), 3),
+            "median": round(statistics.median(latencies), 3),
+            "max": round(max(latencies), 3),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
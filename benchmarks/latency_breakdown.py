@@ -0,0 +1,359 @@
+"""Time each stage of a test.py-style flow separately, without Docker or a GPU.
+
+Desktop stages run against the X display given by --display (e.g. a local Xvfb)
+or, without one, against stand-ins: a static frame for capture and a no-op
+process in place of xdotool. Container readiness is measured against a fake
+docker client whose "container" starts answering after --boot-delay seconds.
+Grounding stages use the tiny stand-in model from benchmarks.tiny_model.
+
+Results are printed (or written to --output) as JSON for regression tracking.
+
+Example:
+    python -m benchmarks.latency_breakdown --runs 20 --output latency.json
+    Xvfb :99 -screen 0 1920x1080x24 &
+    python -m benchmarks.latency_breakdown --display 99
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+from PIL import Image
+
+from framework.decoding import MAX_COORDINATE_TOKENS, CoordinateLogitsProcessor
+from framework.framework import DEFAULT_PORTS, Framework, decode_screenshot
+
+# The controller is not a package; it runs from its own directory in the container
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "desktopController"))
+
+from tools.capture import CaptureBackend  # noqa: E402
+from tools.computer import ComputerTool, ScalingSource, encode_png  # noqa: E402
+from tools.input import InputBackend, InputStep, XdotoolInput  # noqa: E402
+
+
+class StaticCapture(CaptureBackend):
+    """Returns a copy of one frame, standing in for an X server that never changes."""
+
+    name = "static"
+    supports_polling = True
+
+    def __init__(self, image):
+        self.image = image
+
+    async def grab(self):
+        return self.image.copy()
+
+
+class NullInput(InputBackend):
+    name = "null"
+
+    def validate(self, steps):
+        pass
+
+    async def run(self, steps):
+        return "", ""
+
+    async def cursor_position(self):
+        return 0, 0
+
+
+class ReadyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, message_format, *args):
+        pass
+
+
+class FakeContainer:
+    id = "benchmark"
+
+    def __init__(self, port, server_thread):
+        self.port = port
+        self.server_thread = server_thread
+        self.server = None
+        self.attrs = {
+            "NetworkSettings": {
+                "Ports": {port_name: [{"HostPort": str(port)}] for port_name in DEFAULT_PORTS}
+            }
+        }
+
+    def reload(self):
+        pass
+
+    def stop(self):
+        self.server_thread.join()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeDockerClient:
+    """Just enough of docker.DockerClient for Framework.start()."""
+
+    def __init__(self, boot_delay):
+        self.boot_delay = boot_delay
+        self.containers = self
+
+    def run(self, *args, **kwargs):
+        port = free_port()
+
+        def boot():
+            # Connections are refused until the "desktop" has booted, as with noVNC
+            time.sleep(self.boot_delay)
+            container.server = HTTPServer(("127.0.0.1", port), ReadyHandler)
+            threading.Thread(target=container.server.serve_forever, daemon=True).start()
+
+        container = FakeContainer(port, threading.Thread(target=boot, daemon=True))
+        container.server_thread.start()
+        return container
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def serve(app, port=None):
+    """Serve an ASGI app with uvicorn on a background thread, as the controller runs in the container."""
+    import uvicorn
+
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port or free_port(), log_level="warning", access_log=False
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, config.port
+
+
+def summarize(samples, **extra):
+    samples_ms = sorted(sample * 1000 for sample in samples)
+    return {
+        "runs": len(samples_ms),
+        "latency_ms": {
+            "min": round(samples_ms[0], 3),
+            "median": round(statistics.median(samples_ms), 3),
+            "p90": round(samples_ms[int(0.9 * (len(samples_ms) - 1))], 3),
+            "max": round(samples_ms[-1], 3),
+        },
+        **extra,
+    }
+
+
+def measure(function, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def create_tool(args):
+    os.environ["WIDTH"] = str(args.width)
+    os.environ["HEIGHT"] = str(args.height)
+    if args.display is not None:
+        os.environ["DISPLAY_NUM"] = str(args.display)
+        return ComputerTool(capture_backend="xlib", input_backend="xdotool")
+
+    os.environ.pop("DISPLAY_NUM", None)
+    tool = ComputerTool(capture_backend="scrot", input_backend="xdotool")
+    frame = Image.open(args.image).convert("RGB").resize((args.width, args.height))
+    tool._capture = StaticCapture(frame)
+    tool._input = NullInput()
+    return tool
+
+
+def container_stages(args):
+    framework = Framework(vision=False, ports={port: None for port in DEFAULT_PORTS})
+    framework._client = FakeDockerClient(args.boot_delay)
+
+    def start():
+        with contextlib.redirect_stdout(io.StringIO()):
+            framework.start()
+        framework.container.stop()
+
+    runs = max(1, args.runs // 4)  # each run waits for the full boot delay
+    return {
+        "container_ready": summarize(
+            measure(start, runs), boot_delay_seconds=args.boot_delay, mocked=True
+        )
+    }
+
+
+def controller_stages(args, tool, loop):
+    mocked = args.display is None
+    run = loop.run_until_complete
+    xdotool = tool._input
+    if mocked:
+        # Same shell spawn as xdotool, minus the X round trips
+        xdotool = XdotoolInput("")
+        xdotool.xdotool = "true"
+
+    frame = run(tool._capture.grab())
+    size = tool.scale_coordinates(ScalingSource.COMPUTER, args.width, args.height)
+    resized = frame.resize(size, Image.Resampling.LANCZOS)
+    png = encode_png(resized)
+    encoded = base64.b64encode(png)
+
+    def settle(mode):
+        tool.settle_mode = mode
+        return lambda: run(tool.settle())
+
+    stages = {
+        "xdotool": summarize(
+            measure(lambda: run(xdotool.run([InputStep(kind="mouse_move", x=10, y=10)])), args.runs),
+            mocked=mocked,
+        ),
+        "settle_adaptive": summarize(
+            measure(settle("adaptive"), args.runs), quiet_window_seconds=tool.settle_quiet_window, mocked=mocked
+        ),
+        "settle_fixed": summarize(
+            measure(settle("fixed"), max(1, args.runs // 4)), timeout_seconds=tool.settle_timeout
+        ),
+        "capture": summarize(measure(lambda: run(tool._capture.grab()), args.runs), mocked=mocked),
+        "resize": summarize(
+            measure(lambda: frame.resize(size, Image.Resampling.LANCZOS), args.runs),
+            source=f"{frame.width}x{frame.height}",
+            target=f"{size[0]}x{size[1]}",
+        ),
+        "png_encode": summarize(measure(lambda: encode_png(resized), args.runs), bytes=len(png)),
+        "base64_encode": summarize(measure(lambda: base64.b64encode(png), args.runs), bytes=len(encoded)),
+        "base64_decode_pil_open": summarize(
+            measure(lambda: Image.open(io.BytesIO(base64.b64decode(encoded))).load(), args.runs)
+        ),
+        "raw_decode": summarize(
+            measure(
+                lambda: decode_screenshot(
+                    resized.tobytes(), {"X-Width": resized.width, "X-Height": resized.height}, "raw"
+                ),
+                args.runs,
+            )
+        ),
+    }
+    tool.settle_mode = "adaptive"
+    return stages
+
+
+def http_stages(args, tool):
+    import api
+
+    api.computer_tool = tool
+    server, port = serve(api.app)
+    try:
+        framework = Framework(vision=False, ports={"5000/tcp": port})
+        framework.cursor_position()  # open the keep-alive connection
+        stages = {
+            "http_round_trip": summarize(
+                measure(framework.cursor_position, args.runs), action="cursor_position"
+            ),
+            "http_screenshot_raw": summarize(
+                measure(lambda: framework.screenshot_image("raw"), args.runs),
+                mocked=args.display is None,
+            ),
+        }
+        framework.session.close()
+    finally:
+        server.should_exit = True
+    return stages
+
+
+def grounding_stages(args):
+    from qwen_vl_utils import process_vision_info
+
+    from benchmarks.tiny_model import make_model, make_processor
+
+    processor = make_processor()
+    model = make_model(processor)
+    framework = Framework(
+        device="cpu", dtype="float32", model=model, processor=processor, cache_size=0
+    )
+    vision = framework.vision
+    image = Image.open(args.image).convert("RGB")
+    messages = vision._conversation(image, args.query, (framework.MIN_PIXELS, framework.MAX_PIXELS))
+    text = processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    image_inputs, _ = process_vision_info(messages)
+    inputs = processor(text=[text], images=image_inputs, padding=True, return_tensors="pt")
+    prompt_length = inputs.input_ids.shape[1]
+
+    def generate():
+        model.generate(
+            **inputs,
+            max_new_tokens=MAX_COORDINATE_TOKENS,
+            logits_processor=[CoordinateLogitsProcessor(vision.grammar, prompt_length)],
+        )
+
+    generate()  # warm-up
+    return {
+        "process_vision_info": summarize(measure(lambda: process_vision_info(messages), args.runs)),
+        "processor": summarize(
+            measure(
+                lambda: processor(text=[text], images=image_inputs, padding=True, return_tensors="pt"),
+                args.runs,
+            ),
+            prompt_tokens=prompt_length,
+        ),
+        "generate": summarize(measure(generate, args.runs), model="tiny", mocked=True),
+        "ground_end_to_end": summarize(
+            measure(lambda: framework.ground(image, args.query), args.runs), model="tiny", mocked=True
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--display", type=int, default=None, help="X display number to use instead of stand-ins")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--boot-delay", type=float, default=0.5, help="seconds the fake container takes to boot")
+    parser.add_argument("--image", default="test_files/test_3_0.png")
+    parser.add_argument("--query", default="Find the firefox icon")
+    parser.add_argument("--skip-grounding", action="store_true")
+    parser.add_argument("--output", default=None, help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    tool = create_tool(args)
+    loop = asyncio.new_event_loop()
+    stages = {}
+    stages.update(container_stages(args))
+    stages.update(http_stages(args, tool))
+    stages.update(controller_stages(args, tool, loop))
+    if not args.skip_grounding:
+        stages.update(grounding_stages(args))
+    loop.close()
+
+    report = json.dumps({
+        "config": {
+            "runs": args.runs,
+            "display": args.display,
+            "resolution": f"{args.width}x{args.height}",
+            "capture_backend": tool._capture.name,
+            "input_backend": "xdotool",
+            "settle_mode": tool.settle_mode,
+        },
+        "stages": stages,
+    }, indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
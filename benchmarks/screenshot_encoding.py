@@ -0,0 +1,98 @@
+"""Encode time versus size for the screenshot encodings the controller offers.
+
+Each configuration encodes the same frame the way /screenshot does, then decodes
+it as the client would. Sizes are bytes on the wire (base64 adds a third for
+action=screenshot). Use a desktop screenshot and a photo-like page to see where
+PNG stops paying off.
+
+Example:
+    python -m benchmarks.screenshot_encoding --image test_files/test_3_0.png --runs 10
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from framework.framework import decode_screenshot
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "desktopController"))
+
+from tools.encoding import ScreenshotEncoding  # noqa: E402
+
+CONFIGURATIONS = [
+    {"format": "raw"},
+    {"format": "png"},
+    {"format": "png", "grayscale": True},
+    {"format": "jpeg", "quality": 90},
+    {"format": "jpeg", "quality": 80},
+    {"format": "jpeg", "quality": 60},
+    {"format": "webp", "quality": 80},
+    {"format": "webp", "quality": 60},
+    {"format": "png", "preset": "vision"},
+    {"format": "jpeg", "quality": 80, "preset": "vision"},
+    {"format": "jpeg", "quality": 80, "width": 640},
+    {"format": "jpeg", "quality": 80, "grayscale": True},
+]
+
+
+def median_ms(function, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def decode(encoded, image_format):
+    headers = {
+        "X-Width": encoded.width,
+        "X-Height": encoded.height,
+        "X-Pixel-Format": encoded.pixel_format,
+    }
+    image = decode_screenshot(encoded.data, headers, image_format)
+    image.load()
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", default="test_files/test_3_0.png")
+    parser.add_argument("--width", type=int, default=None, help="resize the input first, e.g. to the scaled screen")
+    parser.add_argument("--height", type=int, default=None)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    frame = Image.open(args.image).convert("RGB")
+    if args.width and args.height:
+        frame = frame.resize((args.width, args.height))
+
+    results = []
+    for options in CONFIGURATIONS:
+        encoding = ScreenshotEncoding.from_options(options)
+        encoded = encoding.encode(frame)
+        results.append({
+            **options,
+            "output": f"{encoded.width}x{encoded.height} {encoded.pixel_format}",
+            "bytes": len(encoded.data),
+            "encode_ms": median_ms(lambda encoding=encoding: encoding.encode(frame), args.runs),
+            "decode_ms": median_ms(
+                lambda encoded=encoded, encoding=encoding: decode(encoded, encoding.format), args.runs
+            ),
+        })
+
+    print(json.dumps({
+        "image": args.image,
+        "input": f"{frame.width}x{frame.height}",
+        "runs": args.runs,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Compare polled screenshots with the tile-delta /stream for continuous observation.
+
+A synthetic session replays --frames frames of one screenshot in which a text
+cursor blinks and, with --typing, a line of text grows. Each frame is encoded
+the way action=screenshot returns it (PNG + base64) and the way /stream sends
+it (keyframe, then changed tiles), and both are decoded on the client side.
+Bytes and CPU seconds per frame are reported as JSON.
+
+Example:
+    python -m benchmarks.stream_bandwidth --frames 100 --typing
+"""
+
+import argparse
+import base64
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from framework.stream import FrameDecoder
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "desktopController"))
+
+from tools.computer import encode_png  # noqa: E402
+from tools.stream import TileEncoder  # noqa: E402
+
+
+def session(base, frames, typing):
+    for index in range(frames):
+        image = base.copy()
+        draw = ImageDraw.Draw(image)
+        x = 40
+        if typing:
+            text = "The quick brown fox jumps over the lazy dog. " * 2
+            draw.text((40, 40), text[: index // 2], fill=(0, 0, 0))
+            x += draw.textlength(text[: index // 2])
+        if index % 2:
+            draw.rectangle((x, 40, x + 1, 52), fill=(0, 0, 0))
+        yield image
+
+
+def cpu_time(function, *args):
+    started = time.process_time()
+    result = function(*args)
+    return result, time.process_time() - started
+
+
+def poll(frame):
+    png = base64.b64encode(encode_png(frame))
+    Image.open(io.BytesIO(base64.b64decode(png))).load()
+    return len(png)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=768)
+    parser.add_argument("--tile", type=int, default=64)
+    parser.add_argument("--compression", choices=["zlib", "none"], default="zlib")
+    parser.add_argument("--typing", action="store_true", help="grow a line of text as well as blink a cursor")
+    parser.add_argument("--image", default="test_files/test_3_0.png")
+    args = parser.parse_args()
+
+    base = Image.open(args.image).convert("RGB").resize((args.width, args.height))
+    frames = list(session(base, args.frames, args.typing))
+
+    poll_bytes = poll_seconds = 0
+    for frame in frames:
+        size, seconds = cpu_time(poll, frame)
+        poll_bytes += size
+        poll_seconds += seconds
+
+    encoder = TileEncoder(args.tile, args.compression)
+    decoder = FrameDecoder()
+    stream_seconds = keyframe_bytes = 0
+    for frame in frames:
+        message, seconds = cpu_time(encoder.encode, frame)
+        stream_seconds += seconds
+        if message is None:
+            continue
+        if decoder.frame is None:
+            keyframe_bytes = len(message)
+        _, seconds = cpu_time(decoder.feed, message)
+        stream_seconds += seconds
+    assert decoder.image().tobytes() == frames[-1].tobytes()
+
+    def per_frame(total):
+        return round(total / len(frames), 6)
+
+    print(json.dumps({
+        "frames": len(frames),
+        "resolution": f"{args.width}x{args.height}",
+        "typing": args.typing,
+        "poll_png_base64": {
+            "bytes_per_frame": per_frame(poll_bytes),
+            "cpu_seconds_per_frame": per_frame(poll_seconds),
+        },
+        "stream_tile_delta": {
+            "tile": args.tile,
+            "compression": args.compression,
+            "keyframe_bytes": keyframe_bytes,
+            "messages": decoder.messages,
+            "bytes_per_frame": per_frame(decoder.bytes),
+            "cpu_seconds_per_frame": per_frame(stream_seconds),
+        },
+        "bandwidth_reduction": round(poll_bytes / decoder.bytes, 1),
+        "cpu_reduction": round(poll_seconds / stream_seconds, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
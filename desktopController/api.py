@@ -1,39 +1,228 @@
 import asyncio
-from flask import Flask, request, jsonify
+
+import uvicorn
+from PIL import Image
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.routing import Route
 from tools.computer import ComputerTool, ToolError, ToolResult
+from tools.encoding import ScreenshotEncoding
+from tools.metrics import METRICS, record_screenshot, record_stream_message
+from tools.stream import DEFAULT_TILE_SIZE, KEYFRAME, TileEncoder
 
-app = Flask(__name__)
+STREAM_DEFAULT_FPS = 5.0
+STREAM_MAX_FPS = 30.0
 
-# Create an instance of the ComputerTool class
+# Create an instance of the ComputerTool class. It drives a single display, and every
+# request is handled on the one event loop uvicorn runs for the lifetime of the server.
 computer_tool = ComputerTool()
 
-@app.route("/perform_action", methods=["POST"])
-async def perform_action():
-    data = request.json
+def wants_timings(request: Request):
+    # Per-stage timings are only included when asked for with ?timings=1
+    return request.query_params.get("timings", "").lower() in ("1", "true", "yes")
+
+def result_to_json(result: ToolResult, timings: bool):
+    response = {
+        "output": result.output,
+        "error": result.error,
+        "base64_image": result.base64_image,
+        "media_type": result.media_type,
+        "frame_id": result.frame_id,
+        "settle_time": result.settle_time,
+    }
+    if timings:
+        response["timings"] = result.timings
+    return response
+
+def error(message: str, status_code: int = 400):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+async def read_json(request: Request) -> dict:
+    try:
+        data = await request.json()
+    except ValueError:
+        raise ToolError("request body must be a JSON object") from None
+    if not isinstance(data, dict):
+        raise ToolError("request body must be a JSON object")
+    return data
 
-    # Extracting parameters from the incoming request
-    action = data.get("action")
-    text = data.get("text")
-    coordinate = data.get("coordinate")
+def read_encoding(data: dict) -> ScreenshotEncoding | None:
+    # Optional {"format", "quality", "width", "height", "grayscale", "preset", ...} object;
+    # without one, screenshots stay full-size PNG
+    options = data.get("encoding")
+    if options is None:
+        return None
+    if not isinstance(options, dict):
+        raise ToolError("encoding must be an object")
+    return ScreenshotEncoding.from_options(options)
 
+async def perform_action(request: Request):
     try:
-        # Call the ComputerTool's __call__ method asynchronously
+        data = await read_json(request)
+
+        # Call the ComputerTool's __call__ method; actions on the display run one at a time
         result = await computer_tool(
-            action=action,
-            text=text,
-            coordinate=coordinate,
+            action=data.get("action"),
+            text=data.get("text"),
+            coordinate=data.get("coordinate"),
+            mode=data.get("mode"),
+            delay_ms=data.get("delay_ms"),
+            encoding=read_encoding(data),
         )
 
         # Returning the result as JSON
-        return jsonify({
-            "output": result.output,
-            "error": result.error,
-            "base64_image": result.base64_image,
-        })
+        return JSONResponse(result_to_json(result, wants_timings(request)))
+
+    except ToolError as e:
+        return error(e.message)
 
+async def perform_batch(request: Request):
+    # Runs a list of {"action", "text", "coordinate", "mode", "delay_ms", "checkpoint"} steps in one
+    # round trip; a screenshot is returned only for each checkpoint and the last step.
+    try:
+        data = await read_json(request)
+        actions = data.get("actions")
+        if not isinstance(actions, list):
+            return error("actions must be a list")
+
+        results = await computer_tool.batch(actions, read_encoding(data))
+        timings = wants_timings(request)
+        return JSONResponse({"results": [result_to_json(result, timings) for result in results]})
+
+    except ToolError as e:
+        return error(e.message)
+
+async def screenshot(request: Request):
+    # Binary alternative to action=screenshot: no base64 and no JSON wrapping.
+    # ?format=png (default), jpeg or webp with &quality=1-100, or raw packed pixels;
+    # &width=/&height= or &preset=vision (with &min_pixels=/&max_pixels=) resize,
+    # &grayscale=1 sends one channel. X-Source-* is the size clicks are given in.
+    try:
+        encoding = ScreenshotEncoding.from_options(request.query_params)
+        image = await computer_tool.capture()
+    except ToolError as e:
+        return error(e.message)
+    return await encoded_frame(computer_tool.frames.put(image), image, encoding)
+
+async def frame(request: Request):
+    # A frame from the in-memory ring, by the frame_id a result or X-Frame-Id gave,
+    # in any encoding /screenshot accepts; nothing is captured again
+    stored = computer_tool.frames.get(request.path_params["frame_id"])
+    if stored is None:
+        return error("Frame not found; it was evicted or never existed", 404)
+    try:
+        encoding = ScreenshotEncoding.from_options(request.query_params)
     except ToolError as e:
-        return jsonify({"error": str(e)}), 400
+        return error(e.message)
+    return await encoded_frame(stored.frame_id, stored.image, encoding)
+
+async def encoded_frame(frame_id: int, image: Image.Image, encoding: ScreenshotEncoding):
+    # Off the event loop, so other requests are served while it compresses
+    encoded = await computer_tool.encode(image, encoding)
+    record_screenshot(len(encoded.data))
+
+    return Response(
+        encoded.data,
+        media_type=encoded.media_type,
+        headers={
+            "X-Frame-Id": str(frame_id),
+            "X-Width": str(encoded.width),
+            "X-Height": str(encoded.height),
+            "X-Pixel-Format": encoded.pixel_format,
+            "X-Source-Width": str(image.width),
+            "X-Source-Height": str(image.height),
+        },
+    )
+
+async def stream(request: Request):
+    # Pushes the screen at up to ?fps= frames per second over one chunked response:
+    # a keyframe first, then only the tiles that changed (see tools/stream.py).
+    # Nothing is sent while the screen is still.
+    params = request.query_params
+    try:
+        fps = float(params.get("fps", STREAM_DEFAULT_FPS))
+        tile_size = int(params.get("tile", DEFAULT_TILE_SIZE))
+        keyframe_interval = int(params["keyframe_interval"]) if "keyframe_interval" in params else None
+    except ValueError:
+        return error("fps, tile and keyframe_interval must be numbers")
+    compression = params.get("compression", "zlib")
+    if compression not in ("zlib", "none"):
+        return error(f"Invalid compression: {compression}")
+    if not 0 < fps <= STREAM_MAX_FPS:
+        return error(f"fps must be in (0, {STREAM_MAX_FPS:g}]")
+    if not 8 <= tile_size <= 1024:
+        return error("tile must be between 8 and 1024")
+    if keyframe_interval is not None and keyframe_interval < 1:
+        return error("keyframe_interval must be positive")
+
+    encoder = TileEncoder(tile_size, compression, keyframe_interval)
+
+    async def messages():
+        loop = asyncio.get_running_loop()
+        next_frame = loop.time()
+        while True:
+            try:
+                image = await computer_tool.capture()
+            except ToolError:
+                return  # the status line is already sent; ending the stream is the error
+            message = await asyncio.to_thread(encoder.encode, image)
+            if message is not None:
+                record_stream_message("keyframe" if message[0] == KEYFRAME else "delta", len(message))
+                yield message
+            # drop frames rather than queue them when capture and encode fall behind
+            next_frame = max(next_frame + 1 / fps, loop.time())
+            await asyncio.sleep(next_frame - loop.time())
+
+    return StreamingResponse(
+        messages(),
+        media_type="application/octet-stream",
+        headers={"X-Stream-Format": "tile-delta", "Cache-Control": "no-store"},
+    )
+
+async def window_geometry(request: Request):
+    # Bounds of a named window in screenshot coordinates, used to crop before grounding
+    name = request.query_params.get("name")
+    if not name:
+        return error("name is required")
+
+    try:
+        return JSONResponse(await computer_tool.window_geometry(name))
+    except ToolError as e:
+        return error(e.message, 404)
+
+async def metrics(request: Request):
+    # Prometheus scrape target; actions/sec and error rates are rate() over cvaf_actions_total
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+async def healthz(request: Request):
+    # Readiness: 200 once the display answers through the input backend
+    try:
+        status = await computer_tool.health()
+    except ToolError as e:
+        return error(e.message, 503)
+    except Exception as e:
+        return error(f"display not ready: {e!r}", 503)
+    return JSONResponse(status)
+
+app = Starlette(
+    routes=[
+        Route("/perform_action", perform_action, methods=["POST"]),
+        Route("/perform_batch", perform_batch, methods=["POST"]),
+        Route("/screenshot", screenshot, methods=["GET"]),
+        Route("/frames/{frame_id:int}", frame, methods=["GET"]),
+        Route("/stream", stream, methods=["GET"]),
+        Route("/window_geometry", window_geometry, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/healthz", healthz, methods=["GET"]),
+    ],
+)
 
-# For development purposes, run the Flask app directly (in production use a WSGI server)
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # A single worker: one process and one event loop own the display and its connections
+    uvicorn.run(app, host="0.0.0.0", port=5000, workers=1, access_log=False)
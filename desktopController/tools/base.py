@@ -27,12 +27,26 @@ class ToolResult:
     output: str | None = None
     error: str | None = None
     base64_image: str | None = None
+    media_type: str | None = None
+    frame_id: int | None = None
     system: str | None = None
+    settle_time: float | None = None
+    timings: dict[str, float] | None = None
 
     def __bool__(self):
         return any(getattr(self, field.name) for field in fields(self))
 
     def __add__(self, other: "ToolResult"):
+        def combine_timings(
+            timings: dict[str, float] | None, other_timings: dict[str, float] | None
+        ):
+            if timings and other_timings:
+                return {
+                    stage: timings.get(stage, 0.0) + other_timings.get(stage, 0.0)
+                    for stage in timings.keys() | other_timings.keys()
+                }
+            return timings or other_timings
+
         def combine_fields(
             field: str | None, other_field: str | None, concatenate: bool = True
         ):
@@ -46,7 +60,11 @@ class ToolResult:
             output=combine_fields(self.output, other.output),
             error=combine_fields(self.error, other.error),
             base64_image=combine_fields(self.base64_image, other.base64_image, False),
+            media_type=combine_fields(self.media_type, other.media_type, False),
+            frame_id=combine_fields(self.frame_id, other.frame_id, False),
             system=combine_fields(self.system, other.system),
+            settle_time=combine_fields(self.settle_time, other.settle_time),
+            timings=combine_timings(self.timings, other.timings),
         )
 
     def replace(self, **kwargs):
@@ -0,0 +1,138 @@
+"""Screen capture backends used by ComputerTool."""
+
+import asyncio
+import hashlib
+import shutil
+import threading
+from abc import ABCMeta, abstractmethod
+from pathlib import Path
+from typing import Literal
+from uuid import uuid4
+
+from PIL import Image
+
+from .base import ToolError
+from .run import run
+
+try:
+    from Xlib import X, display as xdisplay
+    from Xlib.error import DisplayError
+except ImportError:
+    xdisplay = None
+
+# scrot and gnome-screenshot can only write to a file; on tmpfs it never reaches the disk
+OUTPUT_DIR = "/dev/shm/outputs" if Path("/dev/shm").is_dir() else "/tmp/outputs"
+
+CaptureBackendName = Literal["auto", "xlib", "scrot"]
+
+FINGERPRINT_REDUCTION = 8
+FINGERPRINT_QUANTIZATION_MASK = 0xF0
+
+
+class CaptureBackend(metaclass=ABCMeta):
+    """Abstract base class for grabbing the full-resolution framebuffer."""
+
+    name: str
+    # whether grab() is cheap enough to poll repeatedly while waiting for the screen to settle
+    supports_polling: bool = False
+
+    @abstractmethod
+    async def grab(self) -> Image.Image:
+        """Return the current screen contents as an RGB image."""
+        ...
+
+
+class XlibCapture(CaptureBackend):
+    """
+    Reads the framebuffer in-process with XGetImage over one persistent X connection.
+    No subprocess is spawned and nothing is written to disk. The grab itself blocks,
+    so it runs in a worker thread to keep other requests and streams moving.
+    """
+
+    name = "xlib"
+    supports_polling = True
+
+    def __init__(self, display_num: int | None):
+        if xdisplay is None:
+            raise ToolError("python-xlib is required for the xlib capture backend")
+        display_name = f":{display_num}" if display_num is not None else None
+        try:
+            self._display = xdisplay.Display(display_name)
+        except DisplayError as e:
+            raise ToolError(f"Cannot open X display {display_name}: {e}") from e
+        self._root = self._display.screen().root
+        # concurrent /screenshot and /stream clients share the one connection
+        self._lock = threading.Lock()
+
+    async def grab(self) -> Image.Image:
+        return await asyncio.to_thread(self._grab)
+
+    def _grab(self) -> Image.Image:
+        with self._lock:
+            geometry = self._root.get_geometry()
+            ximage = self._root.get_image(
+                0, 0, geometry.width, geometry.height, X.ZPixmap, 0xFFFFFFFF
+            )
+        # Xvfb at depth 24 stores pixels as 32-bit little-endian BGRX
+        return Image.frombuffer(
+            "RGB",
+            (geometry.width, geometry.height),
+            ximage.data,
+            "raw",
+            "BGRX",
+            0,
+            1,
+        )
+
+
+class ScrotCapture(CaptureBackend):
+    """Spawns gnome-screenshot or scrot and loads the resulting PNG."""
+
+    name = "scrot"
+
+    def __init__(self, display_prefix: str):
+        self._display_prefix = display_prefix
+
+    async def grab(self) -> Image.Image:
+        output_dir = Path(OUTPUT_DIR)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f"screenshot_{uuid4().hex}.png"
+
+        # Try gnome-screenshot first
+        if shutil.which("gnome-screenshot"):
+            screenshot_cmd = f"{self._display_prefix}gnome-screenshot -f {path} -p"
+        else:
+            # Fall back to scrot if gnome-screenshot isn't available
+            screenshot_cmd = f"{self._display_prefix}scrot -p {path}"
+
+        _, _, stderr = await run(screenshot_cmd)
+        if not path.exists():
+            raise ToolError(f"Failed to take screenshot: {stderr}")
+        try:
+            with Image.open(path) as image:
+                return image.convert("RGB")
+        finally:
+            path.unlink(missing_ok=True)
+
+
+def fingerprint(image: Image.Image) -> bytes:
+    """Hash a downscaled, quantized copy of the image so tiny changes like a blinking caret are damped."""
+    small = image.reduce(FINGERPRINT_REDUCTION)
+    small = small.point(lambda value: value & FINGERPRINT_QUANTIZATION_MASK)
+    return hashlib.blake2b(small.tobytes(), digest_size=16).digest()
+
+
+def create_capture_backend(
+    name: CaptureBackendName, display_num: int | None, display_prefix: str
+) -> CaptureBackend:
+    """Construct the requested backend; "auto" prefers xlib and falls back to scrot."""
+    if name == "scrot":
+        return ScrotCapture(display_prefix)
+    if name == "xlib":
+        return XlibCapture(display_num)
+    if name == "auto":
+        try:
+            return XlibCapture(display_num)
+        except ToolError:
+            return ScrotCapture(display_prefix)
+    raise ToolError(f"Invalid capture backend: {name}")
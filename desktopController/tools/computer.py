@@ -2,21 +2,26 @@ import asyncio
 import base64
 import os
 import shlex
-import shutil
+import time
 from enum import StrEnum
-from pathlib import Path
-from typing import Literal, TypedDict
-from uuid import uuid4
+from typing import Literal, TypedDict, get_args
+
+from PIL import Image
 
 #from anthropic.types.beta import BetaToolComputerUse20241022Param
 
 from .base import BaseAnthropicTool, ToolError, ToolResult
+from .capture import CaptureBackendName, create_capture_backend, fingerprint
+from .encoding import ScreenshotEncoding, encode_png
+from .frames import DEFAULT_FRAME_BUFFER_BYTES, FrameStore
+from .input import InputBackendName, InputStep, create_input_backend
+from .metrics import record_action, record_screenshot, span, trace
 from .run import run
 
-OUTPUT_DIR = "/tmp/outputs"
-
 TYPING_DELAY_MS = 12
 TYPING_GROUP_SIZE = 50
+MAX_TYPING_DELAY_MS = 1000
+DOUBLE_CLICK_DELAY_MS = 500
 
 Action = Literal[
     "key",
@@ -32,6 +37,21 @@ Action = Literal[
 ]
 
 
+# exact: one keystroke per character in TYPING_GROUP_SIZE chunks, TYPING_DELAY_MS apart
+# fast: the whole text in one invocation with no delay; ASCII only
+# paste: put the text on the X selections and press PASTE_KEY
+TypingMode = Literal["exact", "fast", "paste"]
+
+
+class BatchAction(TypedDict, total=False):
+    action: Action
+    text: str | None
+    coordinate: tuple[int, int] | None
+    mode: TypingMode | None
+    delay_ms: int | None
+    checkpoint: bool
+
+
 class Resolution(TypedDict):
     width: int
     height: int
@@ -46,6 +66,16 @@ MAX_SCALING_TARGETS: dict[str, Resolution] = {
 }
 
 
+SettleMode = Literal["fixed", "adaptive"]
+
+
+class WindowGeometry(TypedDict):
+    x: int
+    y: int
+    width: int
+    height: int
+
+
 class ScalingSource(StrEnum):
     COMPUTER = "computer"
     API = "api"
@@ -73,7 +103,10 @@ class ComputerTool(BaseAnthropicTool):
     height: int
     display_num: int | None
 
+    # in adaptive settle mode this is the upper bound rather than a fixed sleep
     _screenshot_delay = 2.0
+    _settle_quiet_window = 0.3
+    _settle_poll_interval = 0.05
     _scaling_enabled = True
 
     @property
@@ -90,7 +123,15 @@ class ComputerTool(BaseAnthropicTool):
     #def to_params(self) -> BetaToolComputerUse20241022Param:
     #    return {"name": self.name, "type": self.api_type, **self.options}
 
-    def __init__(self):
+    def __init__(
+        self,
+        capture_backend: CaptureBackendName | None = None,
+        input_backend: InputBackendName | None = None,
+        settle_mode: SettleMode | None = None,
+        settle_quiet_window: float | None = None,
+        settle_timeout: float | None = None,
+        frame_buffer_bytes: int | None = None,
+    ):
         super().__init__()
 
         self.width = int(os.getenv("WIDTH") or 0)
@@ -103,7 +144,41 @@ class ComputerTool(BaseAnthropicTool):
             self.display_num = None
             self._display_prefix = ""
 
-        self.xdotool = f"{self._display_prefix}xdotool"
+        self._input = create_input_backend(
+            input_backend or os.getenv("INPUT_BACKEND") or "auto",  # pyright: ignore[reportArgumentType]
+            self.display_num,
+            self._display_prefix,
+        )
+        self._capture = create_capture_backend(
+            capture_backend or os.getenv("CAPTURE_BACKEND") or "auto",  # pyright: ignore[reportArgumentType]
+            self.display_num,
+            self._display_prefix,
+        )
+
+        # Input and the settle/screenshot that follows it must not interleave with
+        # another request's on the same display
+        self._action_lock = asyncio.Lock()
+
+        self.settle_mode = settle_mode or os.getenv("SETTLE_MODE") or "adaptive"
+        if self.settle_mode not in ("fixed", "adaptive"):
+            raise ToolError(f"Invalid settle mode: {self.settle_mode}")
+        # an explicit 0 is meaningful: no quiet window, or no wait at all
+        if settle_quiet_window is None:
+            settle_quiet_window = float(
+                os.getenv("SETTLE_QUIET_WINDOW") or self._settle_quiet_window
+            )
+        self.settle_quiet_window = settle_quiet_window
+        if settle_timeout is None:
+            settle_timeout = float(os.getenv("SETTLE_TIMEOUT") or self._screenshot_delay)
+        self.settle_timeout = settle_timeout
+        # recent screenshots, so a client can fetch one again in another encoding
+        self.frames = FrameStore(
+            int(
+                frame_buffer_bytes
+                or os.getenv("FRAME_BUFFER_BYTES")
+                or DEFAULT_FRAME_BUFFER_BYTES
+            )
+        )
 
     async def __call__(
         self,
@@ -111,8 +186,193 @@ class ComputerTool(BaseAnthropicTool):
         action: Action,
         text: str | None = None,
         coordinate: tuple[int, int] | None = None,
+        mode: TypingMode | None = None,
+        delay_ms: int | None = None,
+        encoding: ScreenshotEncoding | None = None,
         **kwargs,
     ):
+        async with self._action_lock:
+            return await self._traced_call(
+                action, text, coordinate, mode, delay_ms, encoding
+            )
+
+    async def _traced_call(
+        self,
+        action: Action,
+        text: str | None,
+        coordinate: tuple[int, int] | None,
+        mode: TypingMode | None,
+        delay_ms: int | None,
+        encoding: ScreenshotEncoding | None,
+    ) -> ToolResult:
+        start = time.perf_counter()
+        label = action if action in get_args(Action) else "invalid"
+        try:
+            with trace() as timings:
+                result = await self._perform(
+                    action, text, coordinate, mode, delay_ms, encoding
+                )
+        except ToolError:
+            record_action(label, time.perf_counter() - start, ok=False)
+            raise
+        record_action(label, time.perf_counter() - start, ok=not result.error)
+        return result.replace(timings=timings)
+
+    async def _perform(
+        self,
+        action: Action,
+        text: str | None,
+        coordinate: tuple[int, int] | None,
+        mode: TypingMode | None,
+        delay_ms: int | None,
+        encoding: ScreenshotEncoding | None,
+    ) -> ToolResult:
+        steps = self._input_steps(action, text, coordinate, mode, delay_ms)
+        self._check_encoding(encoding)
+
+        if action == "screenshot":
+            return await self.screenshot(encoding)
+        elif action == "cursor_position":
+            return await self.cursor_position()
+        elif action == "type":
+            result = await self.send_input(steps, take_screenshot=False)
+            screenshot = await self.screenshot(encoding)
+            return result.replace(
+                base64_image=screenshot.base64_image,
+                media_type=screenshot.media_type,
+                frame_id=screenshot.frame_id,
+            )
+        return await self.send_input(steps, encoding=encoding)
+
+    async def batch(
+        self, actions: list[BatchAction], encoding: ScreenshotEncoding | None = None
+    ) -> list[ToolResult]:
+        """
+        Run a sequence of actions back to back and screenshot only at checkpoints.
+
+        All steps between checkpoints go to the input backend at once, so xdotool
+        chains them into as few invocations as possible.
+        A step with "checkpoint": true (or an explicit "screenshot" step) settles and
+        captures the screen; the last step is always a checkpoint. Returns one
+        result per checkpoint, carrying the output of the steps since the previous one.
+        """
+        async with self._action_lock:
+            return await self._traced_batch(actions, encoding)
+
+    async def _traced_batch(
+        self, actions: list[BatchAction], encoding: ScreenshotEncoding | None
+    ) -> list[ToolResult]:
+        start = time.perf_counter()
+        try:
+            with trace() as timings:
+                results = await self._perform_batch(actions, timings, encoding)
+        except ToolError:
+            record_action("batch", time.perf_counter() - start, ok=False)
+            raise
+        record_action(
+            "batch",
+            time.perf_counter() - start,
+            ok=not any(result.error for result in results),
+        )
+        return results
+
+    async def _perform_batch(
+        self,
+        actions: list[BatchAction],
+        timings: dict[str, float],
+        encoding: ScreenshotEncoding | None,
+    ) -> list[ToolResult]:
+        if not actions:
+            raise ToolError("actions must not be empty")
+        self._check_encoding(encoding)
+        if not all(isinstance(step, dict) for step in actions):
+            raise ToolError("each action must be an object")
+
+        # validate every step before anything touches the screen
+        plan = [
+            (
+                step.get("action"),
+                self._input_steps(
+                    step.get("action"),
+                    step.get("text"),
+                    step.get("coordinate"),
+                    step.get("mode"),
+                    step.get("delay_ms"),
+                ),
+                bool(step.get("checkpoint")) or step.get("action") == "screenshot",
+            )
+            for step in actions
+        ]
+
+        results: list[ToolResult] = []
+        pending: list[InputStep] = []
+        output: list[str] = []
+        error: list[str] = []
+
+        async def flush():
+            if not pending:
+                return
+            result = await self.send_input(list(pending), take_screenshot=False)
+            output.append(result.output or "")
+            error.append(result.error or "")
+            pending.clear()
+
+        for index, (action, steps, checkpoint) in enumerate(plan):
+            if action == "cursor_position":
+                await flush()
+                output.append((await self.cursor_position()).output or "")
+            pending.extend(steps)
+
+            if checkpoint or index == len(plan) - 1:
+                await flush()
+                settle_time, frame = await self.settle()
+                screenshot = await self.screenshot(encoding, frame)
+                results.append(
+                    ToolResult(
+                        output="".join(output),
+                        error="".join(error),
+                        base64_image=screenshot.base64_image,
+                        media_type=screenshot.media_type,
+                        frame_id=screenshot.frame_id,
+                        settle_time=settle_time,
+                        # spans since the previous checkpoint
+                        timings=dict(timings),
+                    )
+                )
+                output.clear()
+                error.clear()
+                timings.clear()
+
+        return results
+
+    def _input_steps(
+        self,
+        action: Action,
+        text: str | None,
+        coordinate: tuple[int, int] | None,
+        mode: TypingMode | None = None,
+        delay_ms: int | None = None,
+    ) -> list[InputStep]:
+        """Validate an action and return the input steps that perform it."""
+        steps = self._action_steps(action, text, coordinate, mode, delay_ms)
+        # key names are resolved here, so an unknown one fails before any event is sent
+        self._input.validate(steps)
+        return steps
+
+    def _action_steps(
+        self,
+        action: Action,
+        text: str | None,
+        coordinate: tuple[int, int] | None,
+        mode: TypingMode | None,
+        delay_ms: int | None,
+    ) -> list[InputStep]:
+        if action != "type":
+            if mode is not None:
+                raise ToolError(f"mode is not accepted for {action}")
+            if delay_ms is not None:
+                raise ToolError(f"delay_ms is not accepted for {action}")
+
         if action in ("mouse_move", "left_click_drag"):
             if coordinate is None:
                 raise ToolError(f"coordinate is required for {action}")
@@ -128,11 +388,13 @@ class ComputerTool(BaseAnthropicTool):
             )
 
             if action == "mouse_move":
-                return await self.shell(f"{self.xdotool} mousemove --sync {x} {y}")
+                return [InputStep(kind="mouse_move", x=x, y=y)]
             elif action == "left_click_drag":
-                return await self.shell(
-                    f"{self.xdotool} mousedown 1 mousemove --sync {x} {y} mouseup 1"
-                )
+                return [
+                    InputStep(kind="mouse_down", button=1),
+                    InputStep(kind="mouse_move", x=x, y=y),
+                    InputStep(kind="mouse_up", button=1),
+                ]
 
         if action in ("key", "type"):
             if text is None:
@@ -140,21 +402,12 @@ class ComputerTool(BaseAnthropicTool):
             if coordinate is not None:
                 raise ToolError(f"coordinate is not accepted for {action}")
             if not isinstance(text, str):
-                raise ToolError(output=f"{text} must be a string")
+                raise ToolError(f"{text} must be a string")
 
             if action == "key":
-                return await self.shell(f"{self.xdotool} key -- {text}")
+                return [InputStep(kind="key", text=text, delay_ms=TYPING_DELAY_MS)]
             elif action == "type":
-                results: list[ToolResult] = []
-                for chunk in chunks(text, TYPING_GROUP_SIZE):
-                    cmd = f"{self.xdotool} type --delay {TYPING_DELAY_MS} -- {shlex.quote(chunk)}"
-                    results.append(await self.shell(cmd, take_screenshot=False))
-                screenshot_base64 = (await self.screenshot()).base64_image
-                return ToolResult(
-                    output="".join(result.output or "" for result in results),
-                    error="".join(result.error or "" for result in results),
-                    base64_image=screenshot_base64,
-                )
+                return self._typing_steps(text, mode or "exact", delay_ms)
 
         if action in (
             "left_click",
@@ -169,70 +422,209 @@ class ComputerTool(BaseAnthropicTool):
             if coordinate is not None:
                 raise ToolError(f"coordinate is not accepted for {action}")
 
-            if action == "screenshot":
-                return await self.screenshot()
-            elif action == "cursor_position":
-                result = await self.shell(
-                    f"{self.xdotool} getmouselocation --shell",
-                    take_screenshot=False,
-                )
-                output = result.output or ""
-                x, y = self.scale_coordinates(
-                    ScalingSource.COMPUTER,
-                    int(output.split("X=")[1].split("\n")[0]),
-                    int(output.split("Y=")[1].split("\n")[0]),
-                )
-                return result.replace(output=f"X={x},Y={y}")
-            else:
-                click_arg = {
-                    "left_click": "1",
-                    "right_click": "3",
-                    "middle_click": "2",
-                    "double_click": "--repeat 2 --delay 500 1",
-                }[action]
-                return await self.shell(f"{self.xdotool} click {click_arg}")
+            if action in ("screenshot", "cursor_position"):
+                return []
+            elif action == "double_click":
+                return [
+                    InputStep(
+                        kind="click", button=1, repeat=2, delay_ms=DOUBLE_CLICK_DELAY_MS
+                    )
+                ]
+            button = {
+                "left_click": 1,
+                "right_click": 3,
+                "middle_click": 2,
+            }[action]
+            return [InputStep(kind="click", button=button)]
 
         raise ToolError(f"Invalid action: {action}")
 
-    async def screenshot(self):
-        """Take a screenshot of the current screen and return the base64 encoded image."""
-        output_dir = Path(OUTPUT_DIR)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        path = output_dir / f"screenshot_{uuid4().hex}.png"
+    def _typing_steps(
+        self, text: str, mode: TypingMode, delay_ms: int | None
+    ) -> list[InputStep]:
+        if mode not in get_args(TypingMode):
+            raise ToolError(f"Invalid typing mode: {mode}")
+        if delay_ms is not None and (
+            not isinstance(delay_ms, int) or not 0 <= delay_ms <= MAX_TYPING_DELAY_MS
+        ):
+            raise ToolError(
+                f"delay_ms must be an int between 0 and {MAX_TYPING_DELAY_MS}"
+            )
+
+        if mode == "paste":
+            if delay_ms is not None:
+                raise ToolError("delay_ms is not accepted for paste")
+            return [InputStep(kind="paste", text=text)]
+        if mode == "fast":
+            # keysyms for non-ASCII characters are remapped one at a time, which
+            # apps miss without a delay
+            if not text.isascii():
+                raise ToolError("fast typing supports ASCII only; use mode=paste")
+            return [InputStep(kind="type", text=text, delay_ms=delay_ms or 0)]
+        if delay_ms is None:
+            delay_ms = TYPING_DELAY_MS
+        return [
+            InputStep(kind="type", text=chunk, delay_ms=delay_ms)
+            for chunk in chunks(text, TYPING_GROUP_SIZE)
+        ]
+
+    def _check_encoding(self, encoding: ScreenshotEncoding | None):
+        # checked before any input, so a bad request leaves the screen untouched
+        if encoding is not None and encoding.format == "raw":
+            raise ToolError("raw screenshots are only served by /screenshot")
+
+    async def cursor_position(self) -> ToolResult:
+        """Return the pointer position in API coordinates."""
+        x, y = self.scale_coordinates(
+            ScalingSource.COMPUTER, *await self._input.cursor_position()
+        )
+        return ToolResult(output=f"X={x},Y={y}")
+
+    async def health(self) -> dict[str, str | int | None]:
+        """Check that the display answers and describe the backends in use."""
+        await self._input.cursor_position()
+        return {
+            "status": "ok",
+            "display": self.display_num,
+            "capture_backend": self._capture.name,
+            "input_backend": self._input.name,
+        }
+
+    async def window_geometry(self, name: str) -> WindowGeometry:
+        """Return the bounds of the first visible window whose title matches name, in API coordinates."""
+        _, stdout, _ = await run(
+            f"{self._display_prefix}xdotool search --onlyvisible --name {shlex.quote(name)} "
+            "getwindowgeometry --shell"
+        )
+        fields = dict(
+            line.split("=", 1) for line in stdout.splitlines() if "=" in line
+        )
+        if not {"X", "Y", "WIDTH", "HEIGHT"} <= fields.keys():
+            raise ToolError(f"No visible window matches {name!r}")
+        left = max(int(fields["X"]), 0)
+        top = max(int(fields["Y"]), 0)
+        right = min(int(fields["X"]) + int(fields["WIDTH"]), self.width)
+        bottom = min(int(fields["Y"]) + int(fields["HEIGHT"]), self.height)
+        x, y = self.scale_coordinates(ScalingSource.COMPUTER, left, top)
+        x2, y2 = self.scale_coordinates(ScalingSource.COMPUTER, right, bottom)
+        return {"x": x, "y": y, "width": x2 - x, "height": y2 - y}
+
+    async def send_input(
+        self,
+        steps: list[InputStep],
+        take_screenshot=True,
+        encoding: ScreenshotEncoding | None = None,
+    ) -> ToolResult:
+        """Perform input steps and return the output, error, and optionally a screenshot."""
+        with span("input"):
+            output, error = await self._input.run(steps)
+        return await self._observe(
+            ToolResult(output=output, error=error), take_screenshot, encoding
+        )
 
-        # Try gnome-screenshot first
-        if shutil.which("gnome-screenshot"):
-            screenshot_cmd = f"{self._display_prefix}gnome-screenshot -f {path} -p"
+    async def screenshot(
+        self,
+        encoding: ScreenshotEncoding | None = None,
+        frame: Image.Image | None = None,
+    ):
+        """
+        Take a screenshot of the current screen and return the base64 encoded image.
+        frame is an unscaled grab to use instead of capturing again.
+        """
+        image = await self.capture(frame)
+        frame_id = self.frames.put(image)
+        if encoding is None:
+            with span("encode"):
+                data = await asyncio.to_thread(encode_png, image)
+            media_type = "image/png"
         else:
-            # Fall back to scrot if gnome-screenshot isn't available
-            screenshot_cmd = f"{self._display_prefix}scrot -p {path}"
+            encoded = await self.encode(image, encoding)
+            data, media_type = encoded.data, encoded.media_type
+        record_screenshot(len(data))
+        return ToolResult(
+            base64_image=base64.b64encode(data).decode(),
+            media_type=media_type,
+            frame_id=frame_id,
+        )
 
-        result = await self.shell(screenshot_cmd, take_screenshot=False)
+    async def encode(self, image: Image.Image, encoding: ScreenshotEncoding):
+        """Encode a captured frame as requested, off the event loop."""
+        with span("encode"):
+            return await asyncio.to_thread(encoding.encode, image)
+
+    async def capture(self, frame: Image.Image | None = None) -> Image.Image:
+        """Grab the current screen as an RGB image, scaled like screenshot()."""
+        if frame is not None:
+            image = frame
+        else:
+            with span("capture"):
+                image = await self._capture.grab()
         if self._scaling_enabled:
-            x, y = self.scale_coordinates(
+            size = self.scale_coordinates(
                 ScalingSource.COMPUTER, self.width, self.height
             )
-            await self.shell(
-                f"convert {path} -resize {x}x{y}! {path}", take_screenshot=False
-            )
-
-        if path.exists():
-            return result.replace(
-                base64_image=base64.b64encode(path.read_bytes()).decode()
-            )
-        raise ToolError(f"Failed to take screenshot: {result.error}")
+            if size != image.size:
+                with span("resize"):
+                    # PIL releases the GIL here, so the event loop keeps serving
+                    image = await asyncio.to_thread(
+                        image.resize, size, Image.Resampling.LANCZOS
+                    )
+        return image
 
     async def shell(self, command: str, take_screenshot=True) -> ToolResult:
         """Run a shell command and return the output, error, and optionally a screenshot."""
         _, stdout, stderr = await run(command)
-        base64_image = None
+        return await self._observe(
+            ToolResult(output=stdout, error=stderr), take_screenshot
+        )
 
-        if take_screenshot:
-            # delay to let things settle before taking a screenshot
-            await asyncio.sleep(self._screenshot_delay)
-            base64_image = (await self.screenshot()).base64_image
+    async def _observe(
+        self,
+        result: ToolResult,
+        take_screenshot: bool,
+        encoding: ScreenshotEncoding | None = None,
+    ) -> ToolResult:
+        if not take_screenshot:
+            return result
+        # wait for things to settle before taking a screenshot
+        settle_time, frame = await self.settle()
+        screenshot = await self.screenshot(encoding, frame)
+        return result.replace(
+            base64_image=screenshot.base64_image,
+            media_type=screenshot.media_type,
+            frame_id=screenshot.frame_id,
+            settle_time=settle_time,
+        )
 
-        return ToolResult(output=stdout, error=stderr, base64_image=base64_image)
+    async def settle(self) -> tuple[float, Image.Image | None]:
+        """
+        Wait until the screen stops changing (or the timeout passes). Return the seconds
+        waited and, when polling, the last frame grabbed, so it need not be captured again.
+        """
+        with span("settle"):
+            return await self._settle()
+
+    async def _settle(self) -> tuple[float, Image.Image | None]:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if self.settle_mode == "fixed" or not self._capture.supports_polling:
+            await asyncio.sleep(self.settle_timeout)
+            return loop.time() - start, None
+
+        deadline = start + self.settle_timeout
+        frame = await self._capture.grab()
+        last = fingerprint(frame)
+        stable_since = loop.time()
+        while (now := loop.time()) < deadline:
+            if now - stable_since >= self.settle_quiet_window:
+                break
+            await asyncio.sleep(self._settle_poll_interval)
+            frame = await self._capture.grab()
+            current = fingerprint(frame)
+            if current != last:
+                last = current
+                stable_since = loop.time()
+        return loop.time() - start, frame
 
     def scale_coordinates(self, source: ScalingSource, x: int, y: int):
         """Scale coordinates to a target maximum resolution."""
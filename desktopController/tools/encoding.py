@@ -0,0 +1,185 @@
+"""Screenshot encodings a client can ask for: format, quality, size and grayscale."""
+
+import math
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Literal, Mapping, get_args
+
+from PIL import Image
+
+from .base import ToolError
+
+ImageFormat = Literal["png", "jpeg", "webp", "raw"]
+Preset = Literal["vision"]
+
+PNG_COMPRESS_LEVEL = 1
+DEFAULT_QUALITY = 80
+# 0 is libwebp's fastest method; higher ones shave a few percent for several times the time
+WEBP_METHOD = 0
+
+MEDIA_TYPES: dict[ImageFormat, str] = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "raw": "application/octet-stream",
+}
+
+# Qwen2-VL's processor works on 28x28 patches within a pixel budget; these match
+# Framework.MIN_PIXELS and Framework.MAX_PIXELS
+VISION_FACTOR = 28
+VISION_MIN_PIXELS = 256 * 28 * 28
+VISION_MAX_PIXELS = 1344 * 28 * 28
+
+
+def encode_png(image: Image.Image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+
+def smart_resize(
+    height: int, width: int, min_pixels: int, max_pixels: int, factor: int = VISION_FACTOR
+) -> tuple[int, int]:
+    """
+    Return the (height, width) Qwen2-VL resizes an image to: both divisible by factor,
+    height * width within [min_pixels, max_pixels] and the aspect ratio kept.
+    Same arithmetic as qwen_vl_utils.smart_resize, which the controller does not ship.
+    """
+    h_bar = max(factor, round(height / factor) * factor)
+    w_bar = max(factor, round(width / factor) * factor)
+    if h_bar * w_bar > max_pixels:
+        beta = math.sqrt((height * width) / max_pixels)
+        h_bar = math.floor(height / beta / factor) * factor
+        w_bar = math.floor(width / beta / factor) * factor
+    elif h_bar * w_bar < min_pixels:
+        beta = math.sqrt(min_pixels / (height * width))
+        h_bar = math.ceil(height * beta / factor) * factor
+        w_bar = math.ceil(width * beta / factor) * factor
+    return h_bar, w_bar
+
+
+@dataclass(kw_only=True, frozen=True)
+class EncodedImage:
+    data: bytes
+    media_type: str
+    width: int
+    height: int
+    pixel_format: str
+
+
+@dataclass(kw_only=True, frozen=True)
+class ScreenshotEncoding:
+    """
+    How to turn a captured frame into bytes.
+
+    width and height resize the frame; with only one of them the aspect ratio is kept.
+    The "vision" preset instead resizes to the resolution the Qwen2-VL processor would
+    pick for min_pixels and max_pixels, so the model sees the frame without another resize.
+    """
+
+    format: ImageFormat = "png"
+    quality: int | None = None
+    width: int | None = None
+    height: int | None = None
+    grayscale: bool = False
+    preset: Preset | None = None
+    min_pixels: int = VISION_MIN_PIXELS
+    max_pixels: int = VISION_MAX_PIXELS
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any]) -> "ScreenshotEncoding":
+        """Validate options from a query string or a JSON object."""
+        image_format = options.get("format") or "png"
+        if image_format not in get_args(ImageFormat):
+            raise ToolError(f"Invalid format: {image_format}")
+        preset = options.get("preset") or None
+        if preset is not None and preset not in get_args(Preset):
+            raise ToolError(f"Invalid preset: {preset}")
+
+        quality = _int_option(options, "quality", 1, 100)
+        if quality is not None and image_format not in ("jpeg", "webp"):
+            raise ToolError(f"quality is not accepted for {image_format}")
+        width = _int_option(options, "width", 1, 16384)
+        height = _int_option(options, "height", 1, 16384)
+        if preset is not None and (width or height):
+            raise ToolError("width and height are not accepted with a preset")
+        min_pixels = _int_option(options, "min_pixels", 1, None) or VISION_MIN_PIXELS
+        max_pixels = _int_option(options, "max_pixels", 1, None) or VISION_MAX_PIXELS
+        if min_pixels > max_pixels:
+            raise ToolError("min_pixels must not exceed max_pixels")
+
+        grayscale = options.get("grayscale", False)
+        if isinstance(grayscale, str):
+            grayscale = grayscale.lower() in ("1", "true", "yes")
+
+        return cls(
+            format=image_format,
+            quality=quality,
+            width=width,
+            height=height,
+            grayscale=bool(grayscale),
+            preset=preset,
+            min_pixels=min_pixels,
+            max_pixels=max_pixels,
+        )
+
+    def output_size(self, width: int, height: int) -> tuple[int, int]:
+        if self.preset == "vision":
+            resized_height, resized_width = smart_resize(
+                height, width, self.min_pixels, self.max_pixels
+            )
+            return resized_width, resized_height
+        if self.width and self.height:
+            return self.width, self.height
+        if self.width:
+            return self.width, max(1, round(height * self.width / width))
+        if self.height:
+            return max(1, round(width * self.height / height)), self.height
+        return width, height
+
+    def encode(self, image: Image.Image) -> EncodedImage:
+        """Resize, convert and compress image; CPU-bound, so run it off the event loop."""
+        size = self.output_size(image.width, image.height)
+        if size != image.size:
+            # bicubic, like qwen_vl_utils: the vision preset gives the model the same
+            # pixels a client-side resize would have
+            image = image.resize(size, Image.Resampling.BICUBIC)
+        if self.grayscale:
+            image = image.convert("L")
+
+        if self.format == "raw":
+            data = image.tobytes()
+        elif self.format == "png":
+            data = encode_png(image)
+        else:
+            buffer = BytesIO()
+            quality = self.quality or DEFAULT_QUALITY
+            if self.format == "jpeg":
+                image.save(buffer, format="JPEG", quality=quality)
+            else:
+                image.save(buffer, format="WEBP", quality=quality, method=WEBP_METHOD)
+            data = buffer.getvalue()
+
+        return EncodedImage(
+            data=data,
+            media_type=MEDIA_TYPES[self.format],
+            width=image.width,
+            height=image.height,
+            pixel_format=image.mode,
+        )
+
+
+def _int_option(
+    options: Mapping[str, Any], name: str, minimum: int, maximum: int | None
+) -> int | None:
+    value = options.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ToolError(f"{name} must be an integer") from None
+    if number < minimum or (maximum is not None and number > maximum):
+        bound = f"between {minimum} and {maximum}" if maximum else f"at least {minimum}"
+        raise ToolError(f"{name} must be {bound}")
+    return number
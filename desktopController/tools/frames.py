@@ -0,0 +1,57 @@
+"""Bounded in-memory ring of recently captured frames, addressable by frame ID."""
+
+import itertools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PIL import Image
+
+from .metrics import METRICS
+
+DEFAULT_FRAME_BUFFER_BYTES = 64 * 1024 * 1024
+
+
+@dataclass(kw_only=True, frozen=True)
+class StoredFrame:
+    frame_id: int
+    image: Image.Image
+    captured_at: float  # unix time
+
+    @property
+    def size(self) -> int:
+        return self.image.width * self.image.height * len(self.image.getbands())
+
+
+class FrameStore:
+    """
+    Keeps the most recent frames uncompressed, evicting the oldest once they take
+    more than max_bytes, so any of them can later be encoded in any format.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_FRAME_BUFFER_BYTES):
+        self.max_bytes = max_bytes
+        self._frames: OrderedDict[int, StoredFrame] = OrderedDict()
+        self._bytes = 0
+        # IDs start at 1 so a frame ID is always truthy
+        self._ids = itertools.count(1)
+
+    def put(self, image: Image.Image) -> int:
+        frame = StoredFrame(
+            frame_id=next(self._ids), image=image, captured_at=time.time()
+        )
+        self._frames[frame.frame_id] = frame
+        self._bytes += frame.size
+        # the newest frame is kept even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._frames) > 1:
+            _, evicted = self._frames.popitem(last=False)
+            self._bytes -= evicted.size
+        METRICS.set("cvaf_frame_buffer_frames", len(self._frames))
+        METRICS.set("cvaf_frame_buffer_bytes", self._bytes)
+        return frame.frame_id
+
+    def get(self, frame_id: int) -> StoredFrame | None:
+        return self._frames.get(frame_id)
+
+    def __len__(self) -> int:
+        return len(self._frames)
@@ -0,0 +1,309 @@
+"""Pointer and keyboard input backends used by ComputerTool."""
+
+import asyncio
+import shlex
+from abc import ABCMeta, abstractmethod
+from dataclasses import dataclass
+from typing import Literal
+
+from .base import ToolError
+from .run import run
+from .selection import SelectionOwner
+
+try:
+    from Xlib import XK, X, display as xdisplay
+    from Xlib.error import DisplayError
+    from Xlib.ext import xtest
+except ImportError:
+    xdisplay = None
+
+InputBackendName = Literal["auto", "xtest", "xdotool"]
+
+StepKind = Literal["mouse_move", "mouse_down", "mouse_up", "click", "key", "type", "paste"]
+
+# same aliases xdotool accepts for modifiers in "key" combinations
+KEY_ALIASES = {
+    "alt": "Alt_L",
+    "ctrl": "Control_L",
+    "control": "Control_L",
+    "meta": "Meta_L",
+    "super": "Super_L",
+    "shift": "Shift_L",
+}
+
+# characters that have no printable keysym of their own
+CHARACTER_KEYSYMS = {
+    "\n": "Return",
+    "\t": "Tab",
+}
+
+# pastes the CLIPBOARD in GTK, Qt and browsers and PRIMARY in xterm, unlike ctrl+v
+PASTE_KEY = "shift+Insert"
+
+POINTER_SYNC_ATTEMPTS = 50
+POINTER_SYNC_INTERVAL = 0.005  # seconds
+
+
+@dataclass(kw_only=True, frozen=True)
+class InputStep:
+    """A single low-level input operation, independent of the backend that performs it."""
+
+    kind: StepKind
+    x: int = 0
+    y: int = 0
+    button: int = 1
+    repeat: int = 1
+    delay_ms: int = 0
+    text: str = ""
+
+
+class InputBackend(metaclass=ABCMeta):
+    """Abstract base class for injecting pointer and keyboard events."""
+
+    name: str
+    _display_num: int | None = None
+    _selection_owner: SelectionOwner | None = None
+
+    @abstractmethod
+    async def run(self, steps: list[InputStep]) -> tuple[str, str]:
+        """Perform the steps in order and return (output, error)."""
+        ...
+
+    @abstractmethod
+    async def cursor_position(self) -> tuple[int, int]:
+        """Return the pointer position in screen pixels."""
+        ...
+
+    @abstractmethod
+    def validate(self, steps: list[InputStep]):
+        """Raise ToolError for a step this backend cannot perform, before any is sent."""
+        ...
+
+    async def set_selection(self, text: str):
+        """Put text on the PRIMARY and CLIPBOARD selections, ready for PASTE_KEY."""
+        if self._selection_owner is None:
+            self._selection_owner = SelectionOwner(self._display_num)
+        await self._selection_owner.set_text(text)
+
+
+class XdotoolInput(InputBackend):
+    """Spawns xdotool, chaining as many steps as possible into one invocation."""
+
+    name = "xdotool"
+
+    def __init__(self, display_prefix: str, display_num: int | None = None):
+        self.xdotool = f"{display_prefix}xdotool"
+        self._display_num = display_num
+
+    def validate(self, steps: list[InputStep]):
+        # xdotool skips unknown key names with a warning on stderr rather than failing
+        pass
+
+    async def run(self, steps: list[InputStep]) -> tuple[str, str]:
+        output: list[str] = []
+        error: list[str] = []
+        pending: list[str] = []
+
+        async def flush():
+            if not pending:
+                return
+            _, stdout, stderr = await run(f"{self.xdotool} {' '.join(pending)}")
+            output.append(stdout)
+            error.append(stderr)
+            pending.clear()
+
+        for step in steps:
+            if step.kind == "paste":
+                await flush()
+                await self.set_selection(step.text)
+            pending.append(self._subcommand(step))
+            # key and type consume the rest of the command line, so they end a chain
+            if step.kind in ("key", "type", "paste"):
+                await flush()
+        await flush()
+
+        return "".join(output), "".join(error)
+
+    async def cursor_position(self) -> tuple[int, int]:
+        _, stdout, _ = await run(f"{self.xdotool} getmouselocation --shell")
+        return (
+            int(stdout.split("X=")[1].split("\n")[0]),
+            int(stdout.split("Y=")[1].split("\n")[0]),
+        )
+
+    def _subcommand(self, step: InputStep) -> str:
+        if step.kind == "mouse_move":
+            return f"mousemove --sync {step.x} {step.y}"
+        if step.kind == "mouse_down":
+            return f"mousedown {step.button}"
+        if step.kind == "mouse_up":
+            return f"mouseup {step.button}"
+        if step.kind == "click":
+            if step.repeat > 1:
+                return f"click --repeat {step.repeat} --delay {step.delay_ms} {step.button}"
+            return f"click {step.button}"
+        if step.kind == "key":
+            return "key -- " + " ".join(shlex.quote(key) for key in step.text.split())
+        if step.kind == "paste":
+            return f"key --clearmodifiers {PASTE_KEY}"
+        return f"type --delay {step.delay_ms} -- {shlex.quote(step.text)}"
+
+
+class XTestInput(InputBackend):
+    """
+    Injects events in-process through the XTEST extension over one persistent X connection.
+    Keysyms missing from the keyboard map are bound to a spare keycode on demand, as xdotool does.
+    """
+
+    name = "xtest"
+
+    def __init__(self, display_num: int | None):
+        if xdisplay is None:
+            raise ToolError("python-xlib is required for the xtest input backend")
+        display_name = f":{display_num}" if display_num is not None else None
+        try:
+            self._display = xdisplay.Display(display_name)
+        except DisplayError as e:
+            raise ToolError(f"Cannot open X display {display_name}: {e}") from e
+        if not self._display.has_extension("XTEST"):
+            raise ToolError(f"X display {display_name} does not support XTEST")
+        XK.load_keysym_group("xf86")
+        self._display_num = display_num
+        self._root = self._display.screen().root
+        self._scratch_keycode = self._find_scratch_keycode()
+
+    def validate(self, steps: list[InputStep]):
+        for step in steps:
+            if step.kind == "key":
+                for combination in step.text.split():
+                    for name in combination.split("+"):
+                        self._name_keysym(name)
+
+    async def run(self, steps: list[InputStep]) -> tuple[str, str]:
+        for step in steps:
+            if step.kind == "mouse_move":
+                await self._mouse_move(step.x, step.y)
+            elif step.kind == "mouse_down":
+                self._fake(X.ButtonPress, step.button)
+            elif step.kind == "mouse_up":
+                self._fake(X.ButtonRelease, step.button)
+            elif step.kind == "click":
+                for i in range(step.repeat):
+                    if i:
+                        await asyncio.sleep(step.delay_ms / 1000)
+                    self._fake(X.ButtonPress, step.button)
+                    self._fake(X.ButtonRelease, step.button)
+            elif step.kind == "key":
+                for i, combination in enumerate(step.text.split()):
+                    if i:
+                        await asyncio.sleep(step.delay_ms / 1000)
+                    self._press_combination(combination)
+            elif step.kind == "type":
+                for character in step.text:
+                    self._press_keysym(self._character_keysym(character))
+                    if step.delay_ms:
+                        await asyncio.sleep(step.delay_ms / 1000)
+            elif step.kind == "paste":
+                await self.set_selection(step.text)
+                self._press_combination(PASTE_KEY)
+        self._display.sync()
+        return "", ""
+
+    async def cursor_position(self) -> tuple[int, int]:
+        pointer = self._root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+    def _fake(self, event_type: int, detail: int = 0, **kwargs):
+        xtest.fake_input(self._display, event_type, detail, **kwargs)
+        self._display.flush()
+
+    async def _mouse_move(self, x: int, y: int):
+        # equivalent of xdotool's --sync: wait until the server reports the new position
+        self._fake(X.MotionNotify, x=x, y=y)
+        self._display.sync()
+        for _ in range(POINTER_SYNC_ATTEMPTS):
+            if await self.cursor_position() == (x, y):
+                return
+            await asyncio.sleep(POINTER_SYNC_INTERVAL)
+
+    def _press_combination(self, combination: str):
+        keycodes: list[int] = []
+        for name in combination.split("+"):
+            keycode, shift = self._keycode(self._name_keysym(name))
+            if shift and self._shift_keycode not in keycodes:
+                keycodes.append(self._shift_keycode)
+            keycodes.append(keycode)
+        for keycode in keycodes:
+            self._fake(X.KeyPress, keycode)
+        for keycode in reversed(keycodes):
+            self._fake(X.KeyRelease, keycode)
+
+    def _press_keysym(self, keysym: int):
+        keycode, shift = self._keycode(keysym)
+        if shift:
+            self._fake(X.KeyPress, self._shift_keycode)
+        self._fake(X.KeyPress, keycode)
+        self._fake(X.KeyRelease, keycode)
+        if shift:
+            self._fake(X.KeyRelease, self._shift_keycode)
+
+    @property
+    def _shift_keycode(self) -> int:
+        return self._display.keysym_to_keycode(XK.XK_Shift_L)
+
+    def _keycode(self, keysym: int) -> tuple[int, bool]:
+        """Return the keycode for a keysym and whether Shift must be held."""
+        keycode = self._display.keysym_to_keycode(keysym)
+        if keycode:
+            if self._display.keycode_to_keysym(keycode, 0) == keysym:
+                return keycode, False
+            if self._display.keycode_to_keysym(keycode, 1) == keysym:
+                return keycode, True
+        if not self._scratch_keycode:
+            raise ToolError(f"No keycode available for keysym {keysym:#x}")
+        self._display.change_keyboard_mapping(
+            self._scratch_keycode, [(keysym, keysym)]
+        )
+        self._display.sync()
+        return self._scratch_keycode, False
+
+    def _find_scratch_keycode(self) -> int:
+        first = self._display.display.info.min_keycode
+        count = self._display.display.info.max_keycode - first + 1
+        mapping = self._display.get_keyboard_mapping(first, count)
+        for offset, keysyms in enumerate(mapping):
+            if not any(keysyms):
+                return first + offset
+        return 0
+
+    def _name_keysym(self, name: str) -> int:
+        name = KEY_ALIASES.get(name.lower(), name)
+        keysym = XK.string_to_keysym(name)
+        if keysym == X.NoSymbol and len(name) == 1:
+            keysym = self._character_keysym(name)
+        if keysym == X.NoSymbol:
+            raise ToolError(f"Invalid key: {name}")
+        return keysym
+
+    def _character_keysym(self, character: str) -> int:
+        if character in CHARACTER_KEYSYMS:
+            return XK.string_to_keysym(CHARACTER_KEYSYMS[character])
+        if ord(character) < 0x100:
+            return ord(character)
+        return 0x01000000 | ord(character)
+
+
+def create_input_backend(
+    name: InputBackendName, display_num: int | None, display_prefix: str
+) -> InputBackend:
+    """Construct the requested backend; "auto" prefers xtest and falls back to xdotool."""
+    if name == "xdotool":
+        return XdotoolInput(display_prefix, display_num)
+    if name == "xtest":
+        return XTestInput(display_num)
+    if name == "auto":
+        try:
+            return XTestInput(display_num)
+        except ToolError:
+            return XdotoolInput(display_prefix, display_num)
+    raise ToolError(f"Invalid input backend: {name}")
@@ -0,0 +1,172 @@
+"""Per-action timing spans and process-wide metrics in the Prometheus text format."""
+
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Iterator, Literal
+
+MetricKind = Literal["counter", "gauge", "histogram"]
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216)
+
+# timings of the action currently running in this task, if any
+_current_trace: ContextVar[dict[str, float] | None] = ContextVar("trace", default=None)
+
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...]
+    counts: list[int] = field(default_factory=list)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        self.counts = [0] * len(self.buckets)
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """Thread-safe registry of labelled counters, gauges and histograms."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._descriptions: dict[str, tuple[MetricKind, str]] = {}
+        self._values: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, Histogram]] = {}
+
+    def describe(self, name: str, kind: MetricKind, help_text: str):
+        self._descriptions[name] = (kind, help_text)
+        if kind == "histogram":
+            self._histograms.setdefault(name, {})
+        else:
+            self._values.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: str):
+        with self._lock:
+            self._values[name][tuple(sorted(labels.items()))] = value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+        **labels: str,
+    ):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms[name]
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines: list[str] = []
+        with self._lock:
+            for name, (kind, help_text) in self._descriptions.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind != "histogram":
+                    for key, value in self._values[name].items():
+                        lines.append(f"{name}{_labels(key)} {_number(value)}")
+                    continue
+                for key, histogram in self._histograms[name].items():
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        bucket_key = key + (("le", _number(bound)),)
+                        lines.append(f"{name}_bucket{_labels(bucket_key)} {count}")
+                    lines.append(f'{name}_bucket{_labels(key + (("le", "+Inf"),))} {histogram.count}')
+                    lines.append(f"{name}_sum{_labels(key)} {_number(histogram.sum)}")
+                    lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key: tuple) -> str:
+    if not key:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in key)
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+METRICS = Metrics()
+METRICS.describe("cvaf_start_time_seconds", "gauge", "Unix time the controller started")
+METRICS.describe("cvaf_actions_total", "counter", "Actions handled, by action and status")
+METRICS.describe("cvaf_action_duration_seconds", "histogram", "Time to handle an action end to end")
+METRICS.describe(
+    "cvaf_stage_duration_seconds",
+    "histogram",
+    "Time spent per stage: input, exec, settle, capture, resize, encode",
+)
+METRICS.describe("cvaf_screenshot_bytes_total", "counter", "Encoded screenshot bytes produced")
+METRICS.describe("cvaf_screenshot_bytes", "histogram", "Size of each encoded screenshot")
+METRICS.describe("cvaf_frame_buffer_frames", "gauge", "Frames held in the in-memory frame ring")
+METRICS.describe("cvaf_frame_buffer_bytes", "gauge", "Uncompressed bytes held in the frame ring")
+METRICS.describe("cvaf_stream_messages_total", "counter", "Stream messages sent, by kind")
+METRICS.describe("cvaf_stream_bytes_total", "counter", "Stream bytes sent, by kind")
+METRICS.set("cvaf_start_time_seconds", time.time())
+
+
+@contextmanager
+def trace() -> Iterator[dict[str, float]]:
+    """Collect the spans of one action into the yielded {stage: seconds} dict."""
+    timings: dict[str, float] = {}
+    token = _current_trace.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a stage into the current trace, if any, and into the stage histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = _current_trace.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+        METRICS.observe("cvaf_stage_duration_seconds", elapsed, stage=stage)
+
+
+def record_action(action: str, seconds: float, ok: bool):
+    status = "ok" if ok else "error"
+    METRICS.inc("cvaf_actions_total", action=action, status=status)
+    METRICS.observe("cvaf_action_duration_seconds", seconds, action=action)
+
+
+def record_screenshot(size: int):
+    METRICS.inc("cvaf_screenshot_bytes_total", size)
+    METRICS.observe("cvaf_screenshot_bytes", size, buckets=SIZE_BUCKETS)
+
+
+def record_stream_message(kind: str, size: int):
+    METRICS.inc("cvaf_stream_messages_total", kind=kind)
+    METRICS.inc("cvaf_stream_bytes_total", size, kind=kind)
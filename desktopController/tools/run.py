@@ -2,6 +2,8 @@
 
 import asyncio
 
+from .metrics import span
+
 TRUNCATED_MESSAGE: str = "<response clipped><NOTE>To save on context only part of this file has been shown to you. You should retry this tool after you have searched inside the file with `grep -n` in order to find the line numbers of what you are looking for.</NOTE>"
 MAX_RESPONSE_LEN: int = 16000
 
@@ -21,6 +23,11 @@ async def run(
     truncate_after: int | None = MAX_RESPONSE_LEN,
 ):
     """Run a shell command asynchronously with a timeout."""
+    with span("exec"):
+        return await _run(cmd, timeout, truncate_after)
+
+
+async def _run(cmd: str, timeout: float | None, truncate_after: int | None):
     process = await asyncio.create_subprocess_shell(
         cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
     )
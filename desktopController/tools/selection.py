@@ -0,0 +1,135 @@
+"""In-process owner of the X selections, used to paste text instead of typing it."""
+
+import asyncio
+import logging
+import os
+import queue
+import select
+import threading
+from contextlib import suppress
+
+from .base import ToolError
+
+try:
+    from Xlib import X, Xatom, display as xdisplay
+    from Xlib.error import DisplayError
+    from Xlib.protocol import event as xevent
+except ImportError:
+    xdisplay = None
+
+SELECTION_TIMEOUT = 2.0  # seconds to wait for the X server to confirm ownership
+# The text is sent in one ChangeProperty request: this header plus the data, within
+# the server's max_request_length (python-xlib does not use BIG-REQUESTS). Anything
+# larger needs the INCR protocol, which few pastes are worth implementing.
+CHANGE_PROPERTY_HEADER_BYTES = 24
+
+logger = logging.getLogger(__name__)
+
+
+class SelectionOwner:
+    """
+    Owns PRIMARY and CLIPBOARD on a hidden window and answers paste requests for them.
+
+    The window lives on its own X connection, served by a daemon thread for as long
+    as the controller runs, so the text stays pasteable after the action returns.
+    """
+
+    def __init__(self, display_num: int | None):
+        if xdisplay is None:
+            raise ToolError("python-xlib is required to paste text")
+        display_name = f":{display_num}" if display_num is not None else None
+        try:
+            self._display = xdisplay.Display(display_name)
+        except DisplayError as e:
+            raise ToolError(f"Cannot open X display {display_name}: {e}") from e
+        screen = self._display.screen()
+        self._window = screen.root.create_window(
+            -10, -10, 1, 1, 0, screen.root_depth
+        )
+        self._clipboard = self._display.intern_atom("CLIPBOARD")
+        self._targets = self._display.intern_atom("TARGETS")
+        self._utf8_string = self._display.intern_atom("UTF8_STRING")
+        self._text_atom = self._display.intern_atom("TEXT")
+        # max_request_length is in 4-byte units
+        self.max_bytes = (
+            self._display.display.info.max_request_length * 4
+            - CHANGE_PROPERTY_HEADER_BYTES
+        )
+        self._text = ""
+        self._pending: queue.Queue[tuple[str, threading.Event]] = queue.Queue()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        threading.Thread(target=self._serve, name="selection-owner", daemon=True).start()
+
+    async def set_text(self, text: str):
+        """Take ownership of both selections with text once the X server has confirmed it."""
+        if len(text.encode()) > self.max_bytes:
+            raise ToolError(
+                f"text is longer than {self.max_bytes} bytes, too long to paste"
+            )
+        owned = threading.Event()
+        self._pending.put((text, owned))
+        os.write(self._wakeup_write, b"\0")
+        if not await asyncio.to_thread(owned.wait, SELECTION_TIMEOUT):
+            raise ToolError("Timed out taking ownership of the X selection")
+
+    def _serve(self):
+        # Only this thread touches the connection, so python-xlib needs no locking
+        while True:
+            readable, _, _ = select.select([self._display, self._wakeup_read], [], [])
+            if self._wakeup_read in readable:
+                os.read(self._wakeup_read, 64)
+                while not self._pending.empty():
+                    self._text, owned = self._pending.get()
+                    for selection in (Xatom.PRIMARY, self._clipboard):
+                        self._window.set_selection_owner(selection, X.CurrentTime)
+                    self._display.sync()
+                    owned.set()
+            while self._display.pending_events():
+                request = self._display.next_event()
+                if request.type == X.SelectionRequest:
+                    # one bad request must not end the thread, or every later paste times out
+                    try:
+                        self._answer(request)
+                    except Exception:
+                        logger.exception("Failed to answer a selection request")
+                        with suppress(Exception):
+                            self._notify(request, X.NONE)
+
+    def _answer(self, request):
+        requestor = request.requestor
+        # obsolete clients leave the property unset and expect the target atom
+        target_property = request.property or request.target
+        if request.target == self._targets:
+            requestor.change_property(
+                target_property,
+                Xatom.ATOM,
+                32,
+                [self._targets, self._utf8_string, self._text_atom, Xatom.STRING],
+            )
+        elif request.target in (self._utf8_string, self._text_atom):
+            requestor.change_property(
+                target_property, self._utf8_string, 8, self._text.encode()
+            )
+        elif request.target == Xatom.STRING:
+            requestor.change_property(
+                target_property,
+                Xatom.STRING,
+                8,
+                self._text.encode("latin-1", errors="replace"),
+            )
+        else:
+            target_property = X.NONE
+        self._notify(request, target_property)
+
+    def _notify(self, request, target_property: int):
+        # X.NONE as the property refuses the request
+        request.requestor.send_event(
+            xevent.SelectionNotify(
+                time=request.time,
+                requestor=request.requestor,
+                selection=request.selection,
+                target=request.target,
+                property=target_property,
+            )
+        )
+        self._display.flush()
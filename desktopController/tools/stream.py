@@ -0,0 +1,107 @@
+"""Tile-delta encoding of the screen for the /stream endpoint.
+
+Every message is a fixed header followed by a payload:
+
+    kind, flags, sequence, width, height, tile size, tile count, payload length
+
+A keyframe's payload is the whole frame as packed RGB. A delta's payload is one
+record per changed tile: its column and row (two uint16) followed by the tile's
+packed RGB pixels. Tiles on the right and bottom edges are clipped to the frame.
+With FLAG_ZLIB set the payload is zlib-compressed. framework/stream.py decodes it.
+"""
+
+import struct
+import zlib
+from typing import Literal
+
+import numpy as np
+from PIL import Image
+
+KEYFRAME = 0
+DELTA = 1
+FLAG_ZLIB = 1
+
+HEADER = struct.Struct("<BBIHHHII")
+TILE_POSITION = struct.Struct("<HH")
+
+DEFAULT_TILE_SIZE = 64
+ZLIB_LEVEL = 1
+# above this share of changed tiles a keyframe is about as small as the delta
+KEYFRAME_CHANGED_FRACTION = 0.5
+
+Compression = Literal["zlib", "none"]
+
+
+class TileEncoder:
+    """Encodes successive frames as a keyframe followed by changed tiles only."""
+
+    def __init__(
+        self,
+        tile_size: int = DEFAULT_TILE_SIZE,
+        compression: Compression = "zlib",
+        keyframe_interval: int | None = None,
+    ):
+        self.tile_size = tile_size
+        self.compression = compression
+        # force a keyframe every n messages, so a client that missed one recovers
+        self.keyframe_interval = keyframe_interval
+        self._previous: np.ndarray | None = None
+        self._sequence = 0
+        self._since_keyframe = 0
+
+    def encode(self, image: Image.Image) -> bytes | None:
+        """Return the message for this frame, or None if nothing changed."""
+        frame = np.asarray(image if image.mode == "RGB" else image.convert("RGB"))
+        previous, self._previous = self._previous, frame
+
+        if (
+            previous is None
+            or previous.shape != frame.shape
+            or (
+                self.keyframe_interval is not None
+                and self._since_keyframe >= self.keyframe_interval
+            )
+        ):
+            return self._message(KEYFRAME, frame, 0, frame.tobytes())
+
+        changed = self.changed_tiles(previous, frame)
+        if not changed.any():
+            return None
+        if changed.mean() > KEYFRAME_CHANGED_FRACTION:
+            return self._message(KEYFRAME, frame, 0, frame.tobytes())
+
+        tile = self.tile_size
+        records = []
+        for row, column in np.argwhere(changed):
+            records.append(TILE_POSITION.pack(column, row))
+            records.append(
+                frame[row * tile : (row + 1) * tile, column * tile : (column + 1) * tile].tobytes()
+            )
+        return self._message(DELTA, frame, len(records) // 2, b"".join(records))
+
+    def changed_tiles(self, previous: np.ndarray, frame: np.ndarray) -> np.ndarray:
+        """Return a (rows, columns) bool array marking the tiles that differ."""
+        tile = self.tile_size
+        height, width = frame.shape[:2]
+        rows, columns = -(-height // tile), -(-width // tile)
+        # compare bytes, not pixels: reducing over a contiguous axis first is ~30x faster
+        changed = (previous != frame).reshape(height, width * 3)
+        if height % tile or width % tile:
+            padded = np.zeros((rows * tile, columns * tile * 3), dtype=bool)
+            padded[:height, : width * 3] = changed
+            changed = padded
+        changed = changed.reshape(rows, tile, columns * tile * 3).any(axis=1)
+        return changed.reshape(rows, columns, tile * 3).any(axis=2)
+
+    def _message(self, kind: int, frame: np.ndarray, tiles: int, payload: bytes) -> bytes:
+        flags = 0
+        if self.compression == "zlib":
+            payload = zlib.compress(payload, ZLIB_LEVEL)
+            flags |= FLAG_ZLIB
+        height, width = frame.shape[:2]
+        header = HEADER.pack(
+            kind, flags, self._sequence, width, height, self.tile_size, tiles, len(payload)
+        )
+        self._sequence += 1
+        self._since_keyframe = 0 if kind == KEYFRAME else self._since_keyframe + 1
+        return header + payload
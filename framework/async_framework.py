@@ -0,0 +1,240 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from PIL import Image
+
+from .framework import (
+    ActionChain,
+    Framework,
+    decode_screenshot,
+    frame_scale,
+    geometry_box,
+    published_ports,
+    result_image,
+    screenshot_params,
+    to_frame_box,
+    to_screen_coords,
+    typing_options,
+)
+from .stream import FrameDecoder
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFramework:
+    """
+    Awaitable counterpart of Framework for driving many desktops from one event loop.
+
+    Container management and grounding reuse a wrapped Framework: blocking docker
+    calls run in the default executor and model inference in a dedicated one, so
+    the loop stays free while thousands of actions are in flight.
+    """
+
+    def __init__(
+        self,
+        framework=None,
+        max_connections=1000,
+        retries=3,
+        inference_workers=1,
+        **kwargs,
+    ):
+        self.framework = framework or Framework(**kwargs)
+        self.max_connections = max_connections
+        self.retries = retries
+        # Created by start() and closed by stop(), so a stopped instance can start again
+        self.client = None
+        # One worker by default: the model is not safe to call concurrently
+        self._inference_executor = ThreadPoolExecutor(max_workers=inference_workers)
+
+    def _new_client(self):
+        connect_timeout, read_timeout = self.framework.timeout
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            # httpx only retries failed connection attempts, never a sent request
+            transport=httpx.AsyncHTTPTransport(retries=self.retries),
+        )
+
+    async def start(self):
+        if self.client is None:
+            self.client = self._new_client()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.framework._run_container)
+        host_ports = await loop.run_in_executor(
+            None, published_ports, self.framework.container
+        )
+        self.framework._bind_urls(host_ports)
+
+        logger.info("Waiting for the container to be ready...")
+        while True:
+            try:
+                response = await self.client.get(self.framework.ready_url)
+                if response.status_code == 200:
+                    logger.info("Container started successfully with ID: %s", self.framework.container.id)
+                    logger.info("View desktop at %s", self.framework.viewer_url)
+                    break  # Exit the loop once the container is ready
+            except httpx.RequestError:
+                pass
+            # Container is not ready yet, wait and retry
+            await asyncio.sleep(0.5)
+
+    async def stop(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.framework._stop_container)
+
+    async def __command(self, action, text=None, coordinate=None, **options):
+        url = f'{self.framework.api_url}/perform_action'
+        data = {
+            'action': action,
+            'text': text,
+            'coordinate': coordinate,
+            **options,
+        }
+
+        try:
+            response = await self.client.post(url, json=data)
+        except httpx.RequestError as e:
+            logger.warning("Error sending command: %s", e)
+            return None
+        if response.is_success and action != "cursor_position" and 'encoding' not in options:
+            self.framework.observe(response)
+        return response
+
+    async def batch(self, actions):
+        url = f'{self.framework.api_url}/perform_batch'
+        try:
+            response = await self.client.post(url, json={'actions': actions})
+        except httpx.RequestError as e:
+            logger.warning("Error sending batch: %s", e)
+            return None
+        if response.is_success:
+            self.framework.observe(response)
+        return response
+
+    def chain(self):
+        # ActionChain.run() returns the batch() coroutine, so callers await it
+        return ActionChain(self)
+
+    async def left_click(self, action="left_click", text=None, coordinate=None):
+        return await self.__command(action, text, coordinate)
+
+    async def right_click(self, action="right_click", text=None, coordinate=None):
+        return await self.__command(action, text, coordinate)
+
+    async def middle_click(self, action="middle_click", text=None, coordinate=None):
+        return await self.__command(action, text, coordinate)
+
+    async def double_click(self, action="double_click", text=None, coordinate=None):
+        return await self.__command(action, text, coordinate)
+
+    async def mouse_move(self, action="mouse_move", text=None, coordinate=None):
+        return await self.__command(action, text, coordinate)
+
+    async def left_click_drag(self, action="left_click_drag", text=None, coordinate=None):
+        return await self.__command(action, text, coordinate)
+
+    async def cursor_position(self, action="cursor_position", text=None, coordinate=None):
+        return await self.__command(action, text, coordinate)
+
+    async def screenshot(self, action="screenshot", text=None, coordinate=None, encoding=None):
+        options = {'encoding': encoding} if encoding is not None else {}
+        return await self.__command(action, text, coordinate, **options)
+
+    async def screenshot_image(self, image_format="raw", quality=None, size=None, grayscale=False, preset=None):
+        url = f'{self.framework.api_url}/screenshot'
+        pixels = (self.framework.MIN_PIXELS, self.framework.MAX_PIXELS)
+        params = screenshot_params(image_format, quality, size, grayscale, preset, pixels)
+        response = await self.client.get(url, params=params)
+        response.raise_for_status()
+        return decode_screenshot(response.content, response.headers, image_format)
+
+    async def frame_image(self, frame_id, image_format="raw", quality=None, size=None, grayscale=False, preset=None):
+        url = f'{self.framework.api_url}/frames/{frame_id}'
+        pixels = (self.framework.MIN_PIXELS, self.framework.MAX_PIXELS)
+        params = screenshot_params(image_format, quality, size, grayscale, preset, pixels)
+        response = await self.client.get(url, params=params)
+        response.raise_for_status()
+        return decode_screenshot(response.content, response.headers, image_format)
+
+    async def vision_frame(self, frame=None, max_age=None):
+        if frame is not None:
+            return frame if isinstance(frame, Image.Image) else result_image(frame)
+        if max_age is None:
+            max_age = self.framework.frame_max_age
+        if max_age is not None:
+            image = self.framework.last_frame(max_age)
+            if image is not None:
+                return image
+        image = await self.screenshot_image(preset="vision" if self.framework.vision_preset else None)
+        self.framework.observe(image)
+        return image
+
+    async def stream(self, fps=5, tile_size=64, compression="zlib", keyframe_interval=None):
+        url = f'{self.framework.api_url}/stream'
+        params = {'fps': fps, 'tile': tile_size, 'compression': compression}
+        if keyframe_interval is not None:
+            params['keyframe_interval'] = keyframe_interval
+        decoder = self.framework.stream_decoder = FrameDecoder()
+        timeout = httpx.Timeout(None, connect=self.framework.timeout[0])
+        async with self.client.stream("GET", url, params=params, timeout=timeout) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                if decoder.feed(chunk):
+                    image = decoder.image()
+                    self.framework.observe(image)
+                    yield image
+
+    async def type(self, action="type", text=None, coordinate=None, mode=None, delay_ms=None):
+        return await self.__command(action, text, coordinate, **typing_options(mode, delay_ms))
+
+    async def key(self, action="key", text=None, coordinate=None):
+        return await self.__command(action, text, coordinate)
+
+    async def window_geometry(self, name):
+        url = f'{self.framework.api_url}/window_geometry'
+        response = await self.client.get(url, params={'name': name})
+        response.raise_for_status()
+        return response.json()
+
+    async def vision_system(self, query, region=None, coarse_to_fine=False, frame=None, max_age=None):
+        region = await self._region_box(region)
+        image = await self.vision_frame(frame, max_age)
+        scale = frame_scale(image)
+        region = to_frame_box(region, scale)
+        loop = asyncio.get_running_loop()
+        if coarse_to_fine:
+            coords, self.framework.last_pass_timings = await loop.run_in_executor(
+                self._inference_executor, self.framework.ground_coarse_to_fine, image, query, region
+            )
+        else:
+            coords = await loop.run_in_executor(
+                self._inference_executor, self.framework.ground, image, query, region
+            )
+        return to_screen_coords(coords, scale)
+
+    async def vision_system_many(self, queries, region=None, frame=None, max_age=None):
+        region = await self._region_box(region)
+        image = await self.vision_frame(frame, max_age)
+        scale = frame_scale(image)
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            self._inference_executor,
+            self.framework.ground_many,
+            image,
+            queries,
+            to_frame_box(region, scale),
+        )
+        return [to_screen_coords(coords, scale) for coords in results]
+
+    async def _region_box(self, region):
+        if isinstance(region, str):
+            return geometry_box(await self.window_geometry(region))
+        return region
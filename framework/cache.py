@@ -0,0 +1,111 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def frame_fingerprint(image):
+    # Exact content hash; identical pixels give the same key on any desktop
+    digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+    digest.update(f"{image.mode}:{image.width}x{image.height}".encode())
+    return digest.hexdigest()
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+class GroundingCache:
+    """
+    Thread-safe LRU cache with an optional TTL for grounding results.
+
+    Keys are built by key() from the frame fingerprint, the normalized query and
+    the pixel budget, so a hit means the model would have seen exactly the same input.
+    """
+
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(fingerprint, query, min_pixels, max_pixels):
+        return (fingerprint, normalize_query(query), min_pixels, max_pixels)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, fingerprint=None):
+        # Drop everything, or only the entries computed on one frame
+        with self._lock:
+            if fingerprint is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == fingerprint]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+class LRUCache:
+    """Small thread-safe LRU map, used for per-frame state that is too large to keep many of."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,135 @@
+import re
+
+# The model answers with relative coordinates like "[0.73, 0.21]". Constrained decoding
+# only lets it emit text of that shape and ends as soon as the closing bracket is out,
+# so a click point costs ~12 decode steps instead of up to 128.
+
+MAX_DECIMALS = 4
+# "[" + 2 * ("0." + MAX_DECIMALS digits) + ", " + "]" plus the end-of-turn token
+MAX_COORDINATE_TOKENS = 2 * (2 + MAX_DECIMALS) + 4 + 1
+
+GRAMMAR_CHARACTERS = set("[]0123456789., ")
+
+COORDINATES_PATTERN = re.compile(r"\[\s*([0-9]*\.?[0-9]+)\s*,\s*([0-9]*\.?[0-9]+)\s*\]")
+
+# States of the "[x, y]" automaton; DONE is accepting
+START, X_INT, X_POINT, X_DECIMALS, COMMA, SPACE, Y_POINT, Y_DECIMALS, DONE = range(9)
+
+
+class GroundingError(ValueError):
+    """The model output could not be read as a coordinate."""
+
+
+def parse_coordinates(text):
+    # Relative (x, y), each clamped to [0, 1]
+    match = COORDINATES_PATTERN.search(text)
+    if match is None:
+        raise GroundingError(f"Expected coordinates like [0.5, 0.5] from the model, got {text!r}")
+    return tuple(min(max(float(value), 0.0), 1.0) for value in match.groups())
+
+
+def advance(state, character):
+    """Next (node, decimals) state after character, or None if the grammar forbids it."""
+    node, decimals = state
+    if node == START:
+        return (X_INT, 0) if character == "[" else None
+    if node in (X_INT, COMMA, SPACE):
+        if character in "01":
+            return (X_POINT if node == X_INT else Y_POINT, 0)
+        if node == COMMA and character == " ":
+            return (SPACE, 0)
+        return None
+    if node in (X_POINT, Y_POINT):
+        if character == ".":
+            return (X_DECIMALS if node == X_POINT else Y_DECIMALS, 0)
+        return _end_of_number(node == X_POINT, character)
+    if node in (X_DECIMALS, Y_DECIMALS):
+        if character.isdigit() and decimals < MAX_DECIMALS:
+            return (node, decimals + 1)
+        if decimals == 0:
+            return None
+        return _end_of_number(node == X_DECIMALS, character)
+    return None
+
+
+def _end_of_number(first, character):
+    if first and character == ",":
+        return (COMMA, 0)
+    if not first and character == "]":
+        return (DONE, 0)
+    return None
+
+
+def advance_text(state, text):
+    for character in text:
+        state = advance(state, character)
+        if state is None:
+            return None
+    return state
+
+
+class CoordinateGrammar:
+    """
+    Token-level view of the coordinate automaton for one tokenizer. Only the few
+    tokens made entirely of grammar characters are ever considered, and the allowed
+    set for each automaton state is computed once.
+    """
+
+    initial_state = (START, 0)
+
+    def __init__(self, tokenizer, stop_ids):
+        self.stop_ids = sorted(stop_ids)
+        self.token_text = {}
+        # all_special_ids is rebuilt on every access; the vocabulary has ~151k entries
+        special_ids = set(tokenizer.all_special_ids)
+        for token, token_id in tokenizer.get_vocab().items():
+            if token_id in special_ids:
+                continue
+            text = tokenizer.convert_tokens_to_string([token])
+            if text and set(text) <= GRAMMAR_CHARACTERS:
+                self.token_text[token_id] = text
+        self._allowed = {}
+
+    def allowed_ids(self, state):
+        if state[0] == DONE:
+            return self.stop_ids
+        if state not in self._allowed:
+            self._allowed[state] = [
+                token_id
+                for token_id, text in self.token_text.items()
+                if advance_text(state, text) is not None
+            ]
+        return self._allowed[state]
+
+    def step(self, state, token_id):
+        return advance_text(state, self.token_text.get(token_id, ""))
+
+    def state_after(self, token_ids):
+        state = self.initial_state
+        for token_id in token_ids:
+            if state[0] == DONE:
+                break
+            state = self.step(state, token_id)
+        return state
+
+    def is_done(self, state):
+        return state[0] == DONE
+
+
+class CoordinateLogitsProcessor:
+    """
+    Masks every token the grammar does not allow after what each row has generated so
+    far; once a row is complete only end-of-turn remains, so generate() stops there.
+    Works with left-padded batches, where every row's prompt has the same length.
+    """
+
+    def __init__(self, grammar, prompt_length):
+        self.grammar = grammar
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids, scores):
+        mask = scores.new_full(scores.shape, float("-inf"))
+        for row, ids in enumerate(input_ids[:, self.prompt_length:].tolist()):
+            state = self.grammar.state_after(ids)
+            mask[row, self.grammar.allowed_ids(state)] = 0
+        return scores + mask
@@ -1,45 +1,322 @@
 import docker
+from docker.errors import ImageNotFound
+import base64
+import copy
+import logging
 import time
 import requests
-import json
-from qwen_vl_utils import process_vision_info
-from transformers import Qwen2VLForConditionalGeneration, AutoProcessor
-import ast
-import base64
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image, ImageDraw
 from io import BytesIO
-import torch
+from .cache import GroundingCache, frame_fingerprint
+from .stream import FrameDecoder
+from .vision import LocalVision, RemoteVision
+
+logger = logging.getLogger(__name__)
+
+# Container ports published to the host. Passing DYNAMIC_PORTS as `ports`
+# lets the OS pick free host ports, so several desktops can share one host.
+DEFAULT_PORTS = {
+    '5900/tcp': 5900,
+    '8501/tcp': 8501,
+    '6080/tcp': 6080,
+    '8080/tcp': 8080,
+    '5000/tcp': 5000
+}
+DYNAMIC_PORTS = {port: None for port in DEFAULT_PORTS}
+
+
+def published_ports(container):
+    # Host ports actually bound for a running container, e.g. {'5000/tcp': 49153}
+    container.reload()
+    bindings = container.attrs['NetworkSettings']['Ports'] or {}
+    return {port: int(hosts[0]['HostPort']) for port, hosts in bindings.items() if hosts}
+
+
+def decode_screenshot(content, headers, image_format):
+    if image_format == "raw":
+        size = (int(headers['X-Width']), int(headers['X-Height']))
+        mode = headers.get('X-Pixel-Format', 'RGB')
+        image = Image.frombuffer(mode, size, content, "raw", mode, 0, 1)
+    else:
+        image = Image.open(BytesIO(content))
+    if 'X-Frame-Id' in headers:
+        image.info['frame_id'] = int(headers['X-Frame-Id'])
+    if 'X-Source-Width' in headers:
+        # the size before the controller resized it, i.e. the one clicks are given in
+        image.info['source_size'] = (int(headers['X-Source-Width']), int(headers['X-Source-Height']))
+    return image
+
+
+def result_image(result):
+    # The screenshot in an action's result: the JSON dict, or the response it came in.
+    # For a batch, the last checkpoint's.
+    if not isinstance(result, dict):
+        result = result.json()
+    if 'results' in result:
+        result = result['results'][-1] if result['results'] else {}
+    if not result.get('base64_image'):
+        raise ValueError("The result carries no screenshot")
+    image = Image.open(BytesIO(base64.b64decode(result['base64_image'])))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if result.get('frame_id'):
+        image.info['frame_id'] = result['frame_id']
+    return image
+
+
+def screenshot_params(image_format, quality=None, size=None, grayscale=False, preset=None, pixels=None):
+    params = {'format': image_format}
+    if quality is not None:
+        params['quality'] = quality
+    if size is not None:
+        params['width'], params['height'] = size
+    if grayscale:
+        params['grayscale'] = 1
+    if preset is not None:
+        params['preset'] = preset
+        params['min_pixels'], params['max_pixels'] = pixels
+    return params
+
+
+def frame_scale(image):
+    # Factors from this frame's pixels to screen pixels; 1 unless the controller resized it
+    source_width, source_height = image.info.get('source_size', image.size)
+    return source_width / image.width, source_height / image.height
+
+
+def to_frame_box(box, scale):
+    if box is None:
+        return None
+    left, top, right, bottom = box
+    return (left / scale[0], top / scale[1], right / scale[0], bottom / scale[1])
+
+
+def to_screen_coords(coords, scale):
+    return [round(coords[0] * scale[0]), round(coords[1] * scale[1])]
+
+
+def typing_options(mode, delay_ms):
+    # Only sent when set, so older controllers keep accepting the request
+    options = {}
+    if mode is not None:
+        options['mode'] = mode
+    if delay_ms is not None:
+        options['delay_ms'] = delay_ms
+    return options
+
+
+def clip_region(image, region):
+    # region is (left, top, right, bottom) in screenshot pixels, or None for the whole frame;
+    # returns it as integers within the frame
+    if region is None:
+        return 0, 0, image.width, image.height
+    left, top, right, bottom = (int(value) for value in region)
+    left, top = max(left, 0), max(top, 0)
+    right, bottom = min(right, image.width), min(bottom, image.height)
+    if right <= left or bottom <= top:
+        raise ValueError(f"Region {region} is outside the {image.width}x{image.height} frame")
+    return left, top, right, bottom
+
+
+def crop_region(image, region):
+    # Returns the crop and its offset
+    left, top, right, bottom = clip_region(image, region)
+    return image.crop((left, top, right, bottom)), (left, top)
+
+
+def geometry_box(geometry):
+    return (
+        geometry['x'],
+        geometry['y'],
+        geometry['x'] + geometry['width'],
+        geometry['y'] + geometry['height'],
+    )
+
+
+class ActionChain:
+    """Collects actions and sends them to the desktop as one batch."""
+
+    def __init__(self, framework):
+        self._framework = framework
+        self._actions = []
+
+    def _add(self, action, text=None, coordinate=None, **options):
+        self._actions.append({'action': action, 'text': text, 'coordinate': coordinate, **options})
+        return self
+
+    def left_click(self):
+        return self._add("left_click")
+
+    def right_click(self):
+        return self._add("right_click")
+
+    def middle_click(self):
+        return self._add("middle_click")
+
+    def double_click(self):
+        return self._add("double_click")
+
+    def mouse_move(self, coordinate):
+        return self._add("mouse_move", coordinate=coordinate)
+
+    def left_click_drag(self, coordinate):
+        return self._add("left_click_drag", coordinate=coordinate)
+
+    def cursor_position(self):
+        return self._add("cursor_position")
+
+    def type(self, text, mode=None, delay_ms=None):
+        return self._add("type", text=text, **typing_options(mode, delay_ms))
+
+    def key(self, text):
+        return self._add("key", text=text)
+
+    def checkpoint(self):
+        # Screenshot after the previous action instead of only at the end
+        if self._actions:
+            self._actions[-1]['checkpoint'] = True
+        return self
+
+    def run(self):
+        return self._framework.batch(self._actions)
+
 
 class Framework:
-    def __init__(self, image_name="sampagon/cvaf:latest", ports=None):
+    def __init__(
+        self,
+        image_name="sampagon/cvaf:latest",
+        ports=None,
+        connect_timeout=3.05,
+        read_timeout=120,
+        retries=3,
+        pool_size=10,
+        cache_size=256,
+        cache_ttl=None,
+        prefix_cache_frames=2,
+        constrained_decoding=True,
+        device="cuda",
+        dtype="bfloat16",
+        num_threads=None,
+        quantization=None,
+        vision=True,
+        vision_url=None,
+        vision_preset=False,
+        frame_max_age=None,
+        model=None,
+        processor=None,
+    ):
         if ports is None:
-            ports = {
-                '5900/tcp': 5900,
-                '8501/tcp': 8501,
-                '6080/tcp': 6080,
-                '8080/tcp': 8080,
-                '5000/tcp': 5000
-            }
-        self.client = docker.from_env()
+            ports = dict(DEFAULT_PORTS)
+        self._client = None
         self.image_name = image_name
         self.ports = ports
+        self._bind_urls({port: host_port for port, host_port in ports.items() if host_port})
+        self.timeout = (connect_timeout, read_timeout)
+        self._retries = retries
+        self._pool_size = pool_size
+        self.session = self._create_session(retries, pool_size)
         self.container = None
+        self.grounding_cache = GroundingCache(maxsize=cache_size, ttl=cache_ttl)
         self.MIN_PIXELS = 256 * 28 * 28
         self.MAX_PIXELS = 1344 * 28 * 28
+        # Coarse-to-fine grounding: first pass budget and the window re-grounded at MAX_PIXELS
+        self.COARSE_MAX_PIXELS = 256 * 28 * 28
+        self.FINE_WINDOW = (448, 448)
+        self.last_pass_timings = None
+        # Fetch frames to ground on already resized to the processor's resolution,
+        # encoded by the controller instead of resized here
+        self.vision_preset = vision_preset
+        # vision_system grounds on the last frame an action returned when it is at most
+        # this many seconds old, instead of capturing again; None always captures
+        self.frame_max_age = frame_max_age
+        self._observation = None
+        # Holds the latest frame of the most recent stream() as a numpy array
+        self.stream_decoder = None
         self._SYSTEM = "Based on the screenshot of the page, I give a text description and you give its corresponding location. The coordinate represents a clickable location [x, y] for an element, which is a relative coordinate on the screenshot, scaled from 0 to 1."
 
-        self.model = Qwen2VLForConditionalGeneration.from_pretrained(
-            "showlab/ShowUI-2B",
-            torch_dtype=torch.bfloat16,
-            device_map="cuda"
-        )
-        self.processor = AutoProcessor.from_pretrained(
-            "Qwen/Qwen2-VL-2B-Instruct", 
-            min_pixels=self.MIN_PIXELS, 
-            max_pixels=self.MAX_PIXELS
+        # Nothing is loaded here: the model is loaded on the first vision_system call,
+        # or never when vision=False. Pass model/processor to reuse loaded ones.
+        # Desktops attached to this Framework share the same vision object.
+        # With vision_url, grounding goes to a shared grounding server instead.
+        self.vision = None
+        if vision and vision_url:
+            self.vision = RemoteVision(vision_url, timeout=self.timeout)
+        elif vision:
+            self.vision = LocalVision(
+                self._SYSTEM,
+                self.MIN_PIXELS,
+                self.MAX_PIXELS,
+                device=device,
+                dtype=dtype,
+                num_threads=num_threads,
+                quantization=quantization,
+                prefix_cache_frames=prefix_cache_frames,
+                constrained=constrained_decoding,
+                model=model,
+                processor=processor,
+            )
+
+    @property
+    def client(self):
+        # Created on first use so grounding-only hosts don't need a Docker daemon
+        if self._client is None:
+            self._client = docker.from_env()
+        return self._client
+
+    def _create_session(self, retries, pool_size):
+        # Keep-alive connections to the controller, reused across actions.
+        # Only connection failures are retried: the request never reached the
+        # server, so replaying a (non-idempotent) action is safe.
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=0.1,
+            allowed_methods=None,
         )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        return session
+
+    def _bind_urls(self, host_ports):
+        self.api_url = f"http://127.0.0.1:{host_ports.get('5000/tcp')}"
+        # The controller's readiness check only passes once it can drive the display
+        self.ready_url = f"{self.api_url}/healthz"
+        self.viewer_url = f"http://127.0.0.1:{host_ports.get('8080/tcp')}"
+
+    def attach(self, container, host_ports):
+        # A view of this Framework bound to another desktop: it shares the docker
+        # client and the vision model but has its own URLs and HTTP session.
+        desktop = copy.copy(self)
+        desktop.container = container
+        desktop._bind_urls(host_ports)
+        desktop.session = self._create_session(self._retries, self._pool_size)
+        desktop._observation = None
+        return desktop
 
     def start(self):
+        self._run_container()
+        self._bind_urls(published_ports(self.container))
+
+        print("Waiting for the container to be ready...")
+        while True:
+            try:
+                response = requests.get(self.ready_url, timeout=self.timeout)
+                if response.status_code == 200:
+                    print(f"Container started successfully with ID: {self.container.id}")
+                    print(f"View desktop at {self.viewer_url}")
+                    break  # Exit the loop once the container is ready
+            except requests.exceptions.RequestException:
+                pass
+            # Container is not ready yet, wait and retry
+            time.sleep(0.5)
+
+    def _run_container(self):
         # Run the container in the background
         try:
             self.container = self.client.containers.run(
@@ -60,44 +337,73 @@ class Framework:
                 tty=True,
                 auto_remove=True
             )
-
-        url = "http://127.0.0.1:6080"
-        print("Waiting for the container to be ready...")
-        while True:
-            try:
-                response = requests.get(url)
-                if response.status_code == 200:
-                    print(f"Container started successfully with ID: {self.container.id}")
-                    print("View desktop at http://127.0.0.1:8080")
-                    break  # Exit the loop once the container is ready
-            except requests.exceptions.RequestException:
-                # Container is not ready yet, wait and retry
-                time.sleep(1)
     
     def stop(self):
+        self.session.close()
+        self._stop_container()
+
+    def _stop_container(self):
         if self.container:
             self.container.stop()
             print(f"Container with ID: {self.container.id} has been stopped")
         else:
             print("No container to stop.")
     
-    def __command(self, action, text=None, coordinate=None):
-        url = 'http://127.0.0.1:5000/perform_action'
-        headers = {
-            'Content-Type': 'application/json'
-        }
+    def __command(self, action, text=None, coordinate=None, **options):
+        url = f'{self.api_url}/perform_action'
         data = {
             'action': action,
             'text': text,
-            'coordinate': coordinate
+            'coordinate': coordinate,
+            **options,
         }
 
-        # Send the request to the Flask API
+        # Send the request to the controller API
         try:
-            response = requests.post(url, headers=headers, data=json.dumps(data))
-            return response
+            response = self.session.post(url, json=data, timeout=self.timeout)
         except requests.exceptions.RequestException as e:
             print(f"Error sending command: {e}")
+            return None
+        # A resized or grayscale screenshot is not one to ground on
+        if response.ok and action != "cursor_position" and 'encoding' not in options:
+            self.observe(response)
+        return response
+
+    def batch(self, actions):
+        # One round trip for the whole sequence; the response holds one result per checkpoint
+        url = f'{self.api_url}/perform_batch'
+        try:
+            response = self.session.post(url, json={'actions': actions}, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Error sending batch: %s", e)
+            return None
+        if response.ok:
+            self.observe(response)
+        return response
+
+    def observe(self, source):
+        # Remember the latest screen seen: an image, or an action's result or response,
+        # which is only decoded if vision_system ends up using it
+        self._observation = (source, time.monotonic())
+
+    def last_frame(self, max_age=None):
+        # The last observed frame, or None if there is none or it is older than max_age seconds
+        if self._observation is None:
+            return None
+        source, observed_at = self._observation
+        if max_age is not None and time.monotonic() - observed_at > max_age:
+            return None
+        if not isinstance(source, Image.Image):
+            try:
+                source = result_image(source)
+            except ValueError:
+                self._observation = None
+                return None
+            self._observation = (source, observed_at)
+        return source
+
+    def chain(self):
+        return ActionChain(self)
 
     def left_click(self, action="left_click", text=None, coordinate=None):
         return self.__command(action, text, coordinate)
@@ -123,57 +429,176 @@ class Framework:
     def cursor_position(self, action="cursor_position", text=None, coordinate=None):
         return self.__command(action, text, coordinate)
     
-    def screenshot(self, action="screenshot", text=None, coordinate=None):
-        return self.__command(action, text, coordinate)
+    def screenshot(self, action="screenshot", text=None, coordinate=None, encoding=None):
+        # encoding is the same options as screenshot_image, e.g. {'format': 'jpeg', 'quality': 70}
+        options = {'encoding': encoding} if encoding is not None else {}
+        return self.__command(action, text, coordinate, **options)
     
-    def type(self, action="type", text=None, coordinate=None):
-        return self.__command(action, text, coordinate)
+    def screenshot_image(self, image_format="raw", quality=None, size=None, grayscale=False, preset=None):
+        # Fetch the screen as binary instead of base64-in-JSON.
+        # "raw" skips encode/decode entirely; "png", "jpeg" and "webp" (with a quality)
+        # are smaller on the wire. size=(width, height) resizes on the controller and
+        # preset="vision" resizes to what the vision processor would for MIN/MAX_PIXELS.
+        url = f'{self.api_url}/screenshot'
+        params = screenshot_params(
+            image_format, quality, size, grayscale, preset, (self.MIN_PIXELS, self.MAX_PIXELS)
+        )
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return decode_screenshot(response.content, response.headers, image_format)
+
+    def frame_image(self, frame_id, image_format="raw", quality=None, size=None, grayscale=False, preset=None):
+        # A frame the controller still holds in memory (the frame_id of an action's
+        # result), re-encoded as asked instead of captured again. 404 once evicted.
+        url = f'{self.api_url}/frames/{frame_id}'
+        params = screenshot_params(
+            image_format, quality, size, grayscale, preset, (self.MIN_PIXELS, self.MAX_PIXELS)
+        )
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return decode_screenshot(response.content, response.headers, image_format)
+
+    def vision_frame(self, frame=None, max_age=None):
+        # The frame vision_system grounds on: frame if given (an image, or an action's
+        # result or response), else the last observed frame if at most max_age seconds
+        # old (frame_max_age by default), else a fresh capture
+        if frame is not None:
+            return frame if isinstance(frame, Image.Image) else result_image(frame)
+        if max_age is None:
+            max_age = self.frame_max_age
+        if max_age is not None:
+            image = self.last_frame(max_age)
+            if image is not None:
+                return image
+        image = self.screenshot_image(preset="vision" if self.vision_preset else None)
+        self.observe(image)
+        return image
+
+    def stream(self, fps=5, tile_size=64, compression="zlib", keyframe_interval=None):
+        # Yields the screen as a PIL image each time it changes, at most fps times a
+        # second. After the first keyframe only changed tiles cross the wire, and
+        # nothing does while the screen is still, so there is no read timeout here.
+        url = f'{self.api_url}/stream'
+        params = {'fps': fps, 'tile': tile_size, 'compression': compression}
+        if keyframe_interval is not None:
+            params['keyframe_interval'] = keyframe_interval
+        decoder = self.stream_decoder = FrameDecoder()
+        with self.session.get(
+            url, params=params, stream=True, timeout=(self.timeout[0], None)
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=None):
+                if decoder.feed(chunk):
+                    image = decoder.image()
+                    self.observe(image)
+                    yield image
+
+    def type(self, action="type", text=None, coordinate=None, mode=None, delay_ms=None):
+        # mode: "exact" (default) types key by key, delay_ms apart; "fast" types ASCII
+        # in one go with no delay; "paste" pastes through the X selection
+        return self.__command(action, text, coordinate, **typing_options(mode, delay_ms))
     
     def key(self, action="key", text=None, coordinate=None):
         return self.__command(action, text, coordinate)
     
-    def vision_system(self, query):
-        # Convert base64 to PIL Image
-
-        image_data = base64.b64decode(self.screenshot().json()['base64_image'])
-        image = Image.open(BytesIO(image_data))
-        
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": self._SYSTEM},
-                    {"type": "image", "image": image, "min_pixels": self.MIN_PIXELS, "max_pixels": self.MAX_PIXELS},
-                    {"type": "text", "text": query}
-                ],
-            }
-        ]
+    def window_geometry(self, name):
+        # {'x', 'y', 'width', 'height'} of the first visible window titled `name`
+        url = f'{self.api_url}/window_geometry'
+        response = self.session.get(url, params={'name': name}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
 
-        # Rest of the processing remains same
-        text = self.processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        image_inputs, video_inputs = process_vision_info(messages)
-        inputs = self.processor(
-            text=[text],
-            images=image_inputs,
-            videos=video_inputs,
-            padding=True,
-            return_tensors="pt"
-        ).to("cuda")
-
-        generated_ids = self.model.generate(**inputs, max_new_tokens=128)
-        generated_ids_trimmed = [
-            out_ids[len(in_ids):] for in_ids, out_ids in zip(inputs.input_ids, generated_ids)
-        ]
-        output_text = self.processor.batch_decode(
-            generated_ids_trimmed, 
-            skip_special_tokens=True,
-            clean_up_tokenization_spaces=False
-        )[0]
-
-        coords = ast.literal_eval(output_text)
-        coords = [
-            int(coords[0] * image.width),
-            int(coords[1] * image.height)
-        ]
+    def vision_system(self, query, region=None, coarse_to_fine=False, frame=None, max_age=None):
+        # region narrows grounding to a (left, top, right, bottom) box or a named window.
+        # coarse_to_fine grounds on a small frame first, then refines around the hit;
+        # the seconds spent per pass are left in last_pass_timings.
+        # frame/max_age pick the frame to ground on, see vision_frame.
+        self._vision()
+        image = self.vision_frame(frame, max_age)
+        scale = frame_scale(image)
+        region = to_frame_box(self._region_box(region), scale)
+        if coarse_to_fine:
+            coords, self.last_pass_timings = self.ground_coarse_to_fine(image, query, region)
+        else:
+            coords = self.ground(image, query, region)
+        return to_screen_coords(coords, scale)
+
+    def vision_system_many(self, queries, region=None, frame=None, max_age=None):
+        # Ground several elements on one frame in one batch: a single padded generate,
+        # or with the prefix cache one batched decode over the frame's cached prefix
+        self._vision()
+        image = self.vision_frame(frame, max_age)
+        scale = frame_scale(image)
+        region = to_frame_box(self._region_box(region), scale)
+        return [to_screen_coords(coords, scale) for coords in self.ground_many(image, queries, region)]
+
+    def _region_box(self, region):
+        if isinstance(region, str):
+            return geometry_box(self.window_geometry(region))
+        return region
+
+    def ground(self, image, query, region=None, max_pixels=None):
+        # Pure inference on an already-captured frame; safe to run in an executor
+        return self.ground_many(image, [query], region, max_pixels)[0]
+
+    def ground_coarse_to_fine(
+        self,
+        image,
+        query,
+        region=None,
+        coarse_max_pixels=None,
+        fine_max_pixels=None,
+        fine_window=None,
+    ):
+        # Pass 1 sees the whole frame (or region) at a small pixel budget; pass 2 sees
+        # only a fine_window-sized crop around that guess, within the region, at the full budget. Small
+        # targets get full-resolution pixels without paying prefill for the whole screen.
+        coarse_max_pixels = coarse_max_pixels or self.COARSE_MAX_PIXELS
+        fine_max_pixels = fine_max_pixels or self.MAX_PIXELS
+        width, height = fine_window or self.FINE_WINDOW
 
-        return coords
+        started = time.perf_counter()
+        x, y = self.ground(image, query, region, coarse_max_pixels)
+        coarse_seconds = time.perf_counter() - started
+
+        # The window stays inside the region (or the frame), shrinking if it is smaller
+        bound_left, bound_top, bound_right, bound_bottom = clip_region(image, region)
+        width, height = min(width, bound_right - bound_left), min(height, bound_bottom - bound_top)
+        left = min(max(x - width // 2, bound_left), bound_right - width)
+        top = min(max(y - height // 2, bound_top), bound_bottom - height)
+        started = time.perf_counter()
+        coords = self.ground(image, query, (left, top, left + width, top + height), fine_max_pixels)
+        fine_seconds = time.perf_counter() - started
+
+        return coords, {"coarse": coarse_seconds, "fine": fine_seconds}
+
+    def _vision(self):
+        if self.vision is None:
+            raise RuntimeError("vision is disabled for this Framework (vision=False)")
+        return self.vision
+
+    def ground_many(self, image, queries, region=None, max_pixels=None):
+        # Answer repeated questions about an unchanged frame from the cache and
+        # only run the model for the rest
+        vision = self._vision()
+        offset = (0, 0)
+        if region is not None:
+            # A crop costs far fewer visual tokens and is seen at a higher effective
+            # resolution; coordinates are mapped back to the full frame below
+            image, offset = crop_region(image, region)
+        # A smaller max_pixels also lowers the floor, so a small budget never upscales
+        max_pixels = max_pixels or self.MAX_PIXELS
+        pixels = (min(self.MIN_PIXELS, max_pixels), max_pixels)
+        fingerprint = frame_fingerprint(image)
+        keys = [
+            self.grounding_cache.key(fingerprint, query, *pixels)
+            for query in queries
+        ]
+        results = [self.grounding_cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            computed = vision.ground(image, fingerprint, [queries[i] for i in missing], pixels)
+            for i, coords in zip(missing, computed):
+                self.grounding_cache.put(keys[i], coords)
+                results[i] = coords
+        return [[coords[0] + offset[0], coords[1] + offset[1]] for coords in results]
@@ -0,0 +1,231 @@
+"""Shared grounding server: loads the vision model once and serves many Frameworks.
+
+Concurrent requests are queued and grouped into micro-batches: the first request
+waits up to --batch-window seconds for others to join before the model runs.
+Per-frame prefix caching is off by default: it grounds frame by frame, and
+clients rarely share a frame, so it would undo the batching. Enable it with
+--prefix-cache-frames when a few clients ask many questions about one screen.
+
+Example:
+    python -m framework.grounding_server --port 7860 --device cuda
+    python -m framework.grounding_server --dummy  # no model, for tests
+
+Clients use it with Framework(vision_url="http://127.0.0.1:7860").
+"""
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+from .cache import frame_fingerprint
+from .framework import Framework
+from .vision import DummyVision
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GroundingJob:
+    image: Image.Image
+    fingerprint: str
+    queries: list
+    pixels: tuple | None
+    future: Future = field(default_factory=Future)
+
+
+class MicroBatcher:
+    """Runs queued jobs on one vision object, a micro-batch at a time, from a single worker thread."""
+
+    def __init__(self, vision, batch_window=0.01, max_batch_size=16):
+        self.vision = vision
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.jobs = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, image, fingerprint, queries, pixels=None):
+        job = GroundingJob(image, fingerprint, queries, pixels)
+        self._queue.put(job)
+        return job.future
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first):
+        jobs = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(jobs) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                # Stop after this batch; put the sentinel back for the main loop
+                self._queue.put(None)
+                break
+            jobs.append(job)
+        return jobs
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            jobs = self._collect(job)
+            try:
+                results = self._ground(jobs)
+            except Exception as e:
+                if len(jobs) == 1:
+                    job.future.set_exception(e)
+                    continue
+                # One bad frame must not fail the other clients' requests: retry each
+                # job alone so only the failing ones get the error
+                for job in jobs:
+                    try:
+                        job.future.set_result(self._ground([job])[0])
+                    except Exception as error:
+                        job.future.set_exception(error)
+                continue
+            for job, coords in zip(jobs, results):
+                job.future.set_result(coords)
+
+    def _ground(self, jobs):
+        results = self.vision.ground_frames(
+            [(job.image, job.fingerprint, job.queries, job.pixels) for job in jobs]
+        )
+        self.batches += 1
+        self.jobs += len(jobs)
+        return results
+
+
+class GroundingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            batcher = self.server.batcher
+            self._send_json(200, {"batches": batcher.batches, "jobs": batcher.jobs})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/ground":
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            # Read the body first so a rejected request leaves the connection reusable
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+        except (TypeError, ValueError) as e:
+            self.close_connection = True
+            self._send_json(400, {"error": f"Invalid grounding request: {e}"})
+            return
+        try:
+            size = (int(self.headers["X-Width"]), int(self.headers["X-Height"]))
+            queries = json.loads(self.headers["X-Queries"])
+            if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+                raise ValueError("X-Queries must be a JSON list of strings")
+            image = Image.frombytes("RGB", size, body)
+            pixels = self.headers.get("X-Pixels")
+            if pixels:
+                pixels = tuple(int(value) for value in pixels.split(","))
+                if len(pixels) != 2 or min(pixels) <= 0 or pixels[0] > pixels[1]:
+                    raise ValueError("X-Pixels must be min_pixels,max_pixels: two positive integers, min first")
+        except (TypeError, ValueError) as e:
+            self._send_json(400, {"error": f"Invalid grounding request: {e}"})
+            return
+        fingerprint = self.headers.get("X-Fingerprint") or frame_fingerprint(image)
+
+        try:
+            coordinates = self.server.batcher.submit(image, fingerprint, queries, pixels).result()
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, {"coordinates": coordinates})
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, message_format, *args):
+        # One line per grounding call is too noisy next to the batch worker
+        pass
+
+
+class GroundingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, vision, host="127.0.0.1", port=7860, batch_window=0.01, max_batch_size=16):
+        self.batcher = MicroBatcher(vision, batch_window, max_batch_size)
+        super().__init__((host, port), GroundingHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--dtype", default="bfloat16")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--quantization", choices=["int8"], default=None)
+    parser.add_argument(
+        "--prefix-cache-frames",
+        type=int,
+        default=0,
+        help="frames whose prefix KV cache is kept; grounds frame by frame instead of batching",
+    )
+    parser.add_argument("--batch-window", type=float, default=0.01, help="seconds to wait for requests to batch")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--dummy", action="store_true", help="answer with the frame centre instead of running the model")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.dummy:
+        vision = DummyVision()
+    else:
+        vision = Framework(
+            device=args.device,
+            dtype=args.dtype,
+            num_threads=args.threads,
+            quantization=args.quantization,
+            prefix_cache_frames=args.prefix_cache_frames,
+        ).vision
+        # Load before accepting requests so the first client doesn't pay for it
+        vision.load()
+
+    server = GroundingServer(vision, args.host, args.port, args.batch_window, args.max_batch_size)
+    logger.info("Grounding server listening on http://%s:%s", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from docker.errors import ImageNotFound
+
+from .framework import DYNAMIC_PORTS, published_ports
+
+logger = logging.getLogger(__name__)
+
+
+class ContainerBackend(ABC):
+    """How the pool launches, probes and stops desktop containers."""
+
+    @abstractmethod
+    def launch(self, image_name):
+        """Start a container with every desktop port bound to an OS-assigned host port."""
+
+    @abstractmethod
+    def host_ports(self, container):
+        """Return {'5000/tcp': host_port, ...} for a running container."""
+
+    @abstractmethod
+    def wait_until_ready(self, container, ready_url, timeout):
+        """Block until the desktop answers on ready_url; raise TimeoutError otherwise."""
+
+    @abstractmethod
+    def stop(self, container):
+        """Stop (and thereby remove) the container."""
+
+
+class DockerBackend(ContainerBackend):
+    def __init__(self, client):
+        self.client = client
+
+    def launch(self, image_name):
+        try:
+            return self._run(image_name)
+        except ImageNotFound:
+            logger.info("Pulling desktop image...")
+            self.client.images.pull(image_name)
+            return self._run(image_name)
+
+    def _run(self, image_name):
+        return self.client.containers.run(
+            image_name,
+            ports=dict(DYNAMIC_PORTS),
+            detach=True,
+            tty=True,
+            auto_remove=True
+        )
+
+    def host_ports(self, container):
+        return published_ports(container)
+
+    def wait_until_ready(self, container, ready_url, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(ready_url, timeout=1).status_code == 200:
+                    return
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.5)
+        raise TimeoutError(f"Container {container.id} not ready after {timeout} seconds")
+
+    def stop(self, container):
+        container.stop()
+
+
+class DesktopPool:
+    """
+    Runs up to `size` desktop containers and keeps `warm` of them booted and idle.
+
+    lease() hands out a Framework bound to one desktop (sharing the model of the
+    Framework the pool was built from). On release the desktop is either recycled,
+    i.e. stopped and replaced by a fresh one, or returned to the pool as-is when
+    on_release="reuse". close() stops the idle desktops at once; leased ones are
+    stopped when they are released.
+    """
+
+    def __init__(
+        self,
+        framework,
+        size=4,
+        warm=1,
+        on_release="recycle",
+        ready_timeout=120,
+        backend=None,
+    ):
+        if warm > size:
+            raise ValueError("warm cannot exceed size")
+        if on_release not in ("recycle", "reuse"):
+            raise ValueError(f"Invalid on_release policy: {on_release}")
+        self.framework = framework
+        self.size = size
+        self.warm = warm
+        self.on_release = on_release
+        self.ready_timeout = ready_timeout
+        self.backend = backend or DockerBackend(framework.client)
+
+        self._idle = deque()
+        self._leased = set()
+        self._booting = 0
+        self._warming = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=size)
+        self._replenish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def total(self):
+        return len(self._idle) + len(self._leased) + self._booting
+
+    @contextmanager
+    def lease(self, timeout=None):
+        desktop = self.acquire(timeout)
+        try:
+            yield desktop
+        finally:
+            self.release(desktop)
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("DesktopPool is closed")
+                if self._idle:
+                    desktop = self._idle.popleft()
+                    self._leased.add(desktop)
+                    self._replenish()
+                    return desktop
+                if self.total < self.size:
+                    self._booting += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No desktop became available in time")
+                self._condition.wait(remaining)
+
+        # Cold start: no warm desktop was available but there is spare capacity
+        desktop = None
+        try:
+            desktop = self._boot()
+            return desktop
+        finally:
+            with self._condition:
+                self._booting -= 1
+                if desktop is not None:
+                    self._leased.add(desktop)
+                self._replenish()
+                self._condition.notify()
+
+    def release(self, desktop):
+        with self._condition:
+            if desktop not in self._leased:
+                # Released already; retiring it again would stop a removed container
+                return
+            self._leased.remove(desktop)
+            if self.on_release == "reuse" and not self._closed:
+                self._idle.append(desktop)
+                self._condition.notify()
+                return
+        self._retire(desktop)
+        with self._condition:
+            self._replenish()
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            # Leased desktops are still in use; release() retires them
+            desktops = list(self._idle)
+            self._idle.clear()
+            self._condition.notify_all()
+        for desktop in desktops:
+            self._retire(desktop)
+        self._executor.shutdown(wait=True)
+
+    def _boot(self):
+        container = self.backend.launch(self.framework.image_name)
+        try:
+            desktop = self.framework.attach(container, self.backend.host_ports(container))
+            self.backend.wait_until_ready(container, desktop.ready_url, self.ready_timeout)
+        except Exception:
+            self.backend.stop(container)
+            raise
+        return desktop
+
+    def _retire(self, desktop):
+        desktop.session.close()
+        self.backend.stop(desktop.container)
+
+    def _replenish(self):
+        # Caller holds the lock. Boot in the background until enough desktops are
+        # idle or booting to cover `warm`, without exceeding `size`.
+        while (
+            not self._closed
+            and len(self._idle) + self._warming < self.warm
+            and self.total < self.size
+        ):
+            self._booting += 1
+            self._warming += 1
+            self._executor.submit(self._boot_warm)
+
+    def _boot_warm(self):
+        try:
+            desktop = self._boot()
+        except Exception as e:
+            logger.warning("Error booting warm desktop: %s", e)
+            desktop = None
+        with self._condition:
+            self._booting -= 1
+            self._warming -= 1
+            if desktop is not None and not self._closed:
+                self._idle.append(desktop)
+                desktop = None
+            self._condition.notify()
+        if desktop is not None:
+            self._retire(desktop)
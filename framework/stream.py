@@ -0,0 +1,78 @@
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image
+
+# Wire format of the controller's /stream endpoint; must match desktopController/tools/stream.py
+KEYFRAME = 0
+DELTA = 1
+FLAG_ZLIB = 1
+HEADER = struct.Struct("<BBIHHHII")
+TILE_POSITION = struct.Struct("<HH")
+
+
+class StreamError(ValueError):
+    pass
+
+
+class FrameDecoder:
+    """Rebuilds the screen from keyframes and tile deltas.
+
+    Feed it the response body in chunks of any size; `frame` is the current
+    screen as a (height, width, 3) uint8 array once the first keyframe arrived.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.sequence = None
+        self.messages = 0
+        self.bytes = 0
+        self._buffer = bytearray()
+
+    def feed(self, chunk):
+        # Returns the sequence numbers of the messages completed by this chunk
+        self._buffer += chunk
+        completed = []
+        while len(self._buffer) >= HEADER.size:
+            kind, flags, sequence, width, height, tile, tiles, length = HEADER.unpack_from(self._buffer)
+            end = HEADER.size + length
+            if len(self._buffer) < end:
+                break
+            payload = bytes(self._buffer[HEADER.size:end])
+            del self._buffer[:end]
+            if flags & FLAG_ZLIB:
+                payload = zlib.decompress(payload)
+            self._apply(kind, width, height, tile, tiles, payload)
+            self.sequence = sequence
+            self.messages += 1
+            self.bytes += end
+            completed.append(sequence)
+        return completed
+
+    def _apply(self, kind, width, height, tile, tiles, payload):
+        if kind == KEYFRAME:
+            self.frame = np.frombuffer(payload, dtype=np.uint8).reshape(height, width, 3).copy()
+            return
+        if kind != DELTA:
+            raise StreamError(f"Unknown stream message kind {kind}")
+        if self.frame is None or self.frame.shape[:2] != (height, width):
+            raise StreamError("Delta received before a matching keyframe")
+
+        offset = 0
+        for _ in range(tiles):
+            column, row = TILE_POSITION.unpack_from(payload, offset)
+            offset += TILE_POSITION.size
+            top, left = row * tile, column * tile
+            bottom, right = min(top + tile, height), min(left + tile, width)
+            size = (bottom - top) * (right - left) * 3
+            self.frame[top:bottom, left:right] = np.frombuffer(
+                payload, dtype=np.uint8, count=size, offset=offset
+            ).reshape(bottom - top, right - left, 3)
+            offset += size
+
+    def image(self):
+        # A copy: later deltas update self.frame in place
+        if self.frame is None:
+            return None
+        return Image.fromarray(self.frame.copy())
@@ -0,0 +1,447 @@
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import requests
+
+from .cache import LRUCache
+from .decoding import (
+    MAX_COORDINATE_TOKENS,
+    CoordinateGrammar,
+    CoordinateLogitsProcessor,
+    parse_coordinates,
+)
+
+if TYPE_CHECKING:
+    from transformers import DynamicCache
+
+# torch, transformers and qwen_vl_utils are imported inside the methods that
+# need them, so importing the framework stays fast when vision is not used.
+
+MODEL_NAME = "showlab/ShowUI-2B"
+PROCESSOR_NAME = "Qwen/Qwen2-VL-2B-Instruct"
+
+VISION_END = "<|vision_end|>"
+
+DTYPES = ("bfloat16", "float16", "float32")
+
+# Frames are resized to each request's pixel budget before they reach the processor,
+# so its own bounds only need to be loose enough never to resize them again
+PROCESSOR_MIN_PIXELS = 4 * 28 * 28
+PROCESSOR_MAX_PIXELS = 16384 * 28 * 28
+
+
+@dataclass
+class PrefixState:
+    past_key_values: "DynamicCache"
+    length: int
+    next_position: int
+
+
+class LocalVision:
+    """
+    Runs ShowUI-2B in-process. The model and processor are loaded on first use
+    unless already-loaded ones are injected.
+    """
+
+    def __init__(
+        self,
+        system_prompt,
+        min_pixels,
+        max_pixels,
+        device="cuda",
+        dtype="bfloat16",
+        num_threads=None,
+        quantization=None,
+        prefix_cache_frames=2,
+        constrained=True,
+        model=None,
+        processor=None,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Invalid dtype: {dtype}")
+        if quantization not in (None, "int8"):
+            raise ValueError(f"Invalid quantization: {quantization}")
+        if quantization and device != "cpu":
+            raise ValueError("int8 dynamic quantization is only supported on CPU")
+        if processor is not None:
+            processor.tokenizer.padding_side = "left"
+
+        self.system_prompt = system_prompt
+        self.min_pixels = min_pixels
+        self.max_pixels = max_pixels
+        self.device = device
+        self.dtype = dtype
+        self.num_threads = num_threads
+        self.quantization = quantization
+        # Only allow "[x, y]" to be generated and stop right after it
+        self.constrained = constrained
+        self._grammar = None
+        self._model = model
+        self._processor = processor
+        # Each cached prefix holds the KV state of up to max_pixels worth of image tokens
+        self.prefix_cache = LRUCache(maxsize=prefix_cache_frames)
+        # Serializes loading and inference; the prefix caches are updated while a query runs
+        self._lock = threading.RLock()
+
+    def load(self):
+        """Load the model and processor now instead of on the first query."""
+        with self._lock:
+            if self._model is None:
+                self._model = self._load_model()
+            if self._processor is None:
+                self._processor = self._load_processor()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    @property
+    def processor(self):
+        if self._processor is None:
+            with self._lock:
+                if self._processor is None:
+                    self._processor = self._load_processor()
+        return self._processor
+
+    @property
+    def grammar(self):
+        if self._grammar is None:
+            with self._lock:
+                if self._grammar is None:
+                    self._grammar = CoordinateGrammar(self.processor.tokenizer, self._stop_ids())
+        return self._grammar
+
+    def _stop_ids(self):
+        tokenizer = self.processor.tokenizer
+        return {tokenizer.eos_token_id, tokenizer.convert_tokens_to_ids("<|im_end|>")}
+
+    def ground(self, image, fingerprint, queries, pixels=None):
+        return self.ground_frames([(image, fingerprint, queries, pixels)])[0]
+
+    def ground_frames(self, frames):
+        # frames is a list of (image, fingerprint, queries, pixels), where pixels is a
+        # (min_pixels, max_pixels) budget or None for the default; returns one list of
+        # coords per frame
+        frames = [
+            (image, fingerprint, queries, pixels or (self.min_pixels, self.max_pixels))
+            for image, fingerprint, queries, pixels in frames
+        ]
+        with self._lock:
+            if self.prefix_cache.maxsize > 0:
+                # One batched decode per frame, over that frame's cached prefix
+                return [self._ground_with_prefix(*frame) for frame in frames]
+            # Without prefix reuse, every query of every frame goes into one padded generate
+            items = [(image, query, pixels) for image, _, queries, pixels in frames for query in queries]
+            coords = self._ground_batch(items)
+            results = []
+            for _, _, queries, _ in frames:
+                results.append(coords[:len(queries)])
+                coords = coords[len(queries):]
+            return results
+
+    def _load_model(self):
+        import torch
+        from transformers import Qwen2VLForConditionalGeneration
+
+        if self.device == "cpu" and self.num_threads:
+            torch.set_num_threads(self.num_threads)
+
+        model = Qwen2VLForConditionalGeneration.from_pretrained(
+            MODEL_NAME,
+            # Dynamic quantization rewrites float32 Linear layers only
+            torch_dtype=torch.float32 if self.quantization else getattr(torch, self.dtype),
+            device_map=self.device
+        )
+        if self.quantization == "int8":
+            # Only the language model: the vision tower reads its Linear weights' dtype directly
+            torch.ao.quantization.quantize_dynamic(
+                model.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+        return model
+
+    def _load_processor(self):
+        from transformers import AutoProcessor
+
+        processor = AutoProcessor.from_pretrained(
+            PROCESSOR_NAME,
+            min_pixels=PROCESSOR_MIN_PIXELS,
+            max_pixels=PROCESSOR_MAX_PIXELS
+        )
+        # Batched generation needs the prompts aligned at the end, i.e. left padding
+        processor.tokenizer.padding_side = "left"
+        return processor
+
+    def _conversation(self, image, query, pixels):
+        min_pixels, max_pixels = pixels
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": self.system_prompt},
+                    {"type": "image", "image": image, "min_pixels": min_pixels, "max_pixels": max_pixels},
+                    {"type": "text", "text": query}
+                ],
+            }
+        ]
+
+    def _to_coords(self, output_text, image):
+        coords = parse_coordinates(output_text)
+        return [
+            int(coords[0] * image.width),
+            int(coords[1] * image.height)
+        ]
+
+    def _ground_batch(self, items):
+        # items is a list of (image, query, pixels)
+        from qwen_vl_utils import process_vision_info
+
+        conversations = [self._conversation(*item) for item in items]
+
+        texts = [
+            self.processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+            for messages in conversations
+        ]
+        # Queries on the same frame share it, so each distinct frame is resized once per budget
+        resized = {}
+        image_inputs = []
+        for (image, _, pixels), messages in zip(items, conversations):
+            key = (id(image), pixels)
+            if key not in resized:
+                resized[key] = process_vision_info(messages)[0][0]
+            image_inputs.append(resized[key])
+        inputs = self.processor(
+            text=texts,
+            images=image_inputs,
+            padding=True,
+            return_tensors="pt"
+        ).to(self.model.device)
+
+        if self.constrained:
+            generated_ids = self.model.generate(
+                **inputs,
+                max_new_tokens=MAX_COORDINATE_TOKENS,
+                logits_processor=[CoordinateLogitsProcessor(self.grammar, inputs.input_ids.shape[1])],
+            )
+        else:
+            generated_ids = self.model.generate(**inputs, max_new_tokens=128)
+        generated_ids_trimmed = [
+            out_ids[len(in_ids):] for in_ids, out_ids in zip(inputs.input_ids, generated_ids)
+        ]
+        output_texts = self.processor.batch_decode(
+            generated_ids_trimmed,
+            skip_special_tokens=True,
+            clean_up_tokenization_spaces=False
+        )
+
+        return [self._to_coords(output_text, image) for output_text, (image, _, _) in zip(output_texts, items)]
+
+    def _prefix_state(self, image, fingerprint, pixels):
+        # KV cache for everything up to and including the image, computed once per frame
+        import torch
+        from qwen_vl_utils import process_vision_info
+        from transformers import DynamicCache
+
+        state = self.prefix_cache.get((fingerprint, pixels))
+        if state is not None:
+            return state
+
+        messages = self._conversation(image, "", pixels)
+        text = self.processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        prefix_text = text[:text.index(VISION_END) + len(VISION_END)]
+        image_inputs, _ = process_vision_info(messages)
+        inputs = self.processor(
+            text=[prefix_text],
+            images=image_inputs,
+            return_tensors="pt"
+        ).to(self.model.device)
+
+        position_ids, _ = self.model.get_rope_index(
+            inputs.input_ids, inputs.image_grid_thw, None, inputs.attention_mask
+        )
+        past_key_values = DynamicCache()
+        with torch.no_grad():
+            # Only the KV cache is kept, so skip lm_head: it would compute
+            # full-vocabulary logits for every prefix token
+            self.model.model(
+                inputs_embeds=self._input_embeds(inputs),
+                attention_mask=inputs.attention_mask,
+                position_ids=position_ids,
+                past_key_values=past_key_values,
+                use_cache=True,
+            )
+
+        state = PrefixState(
+            past_key_values=past_key_values,
+            length=inputs.input_ids.shape[1],
+            # Text after the image continues from the last prefix position on all three rope axes
+            next_position=int(position_ids[0, 0, -1]) + 1,
+        )
+        self.prefix_cache.put((fingerprint, pixels), state)
+        return state
+
+    def _input_embeds(self, inputs):
+        # Token embeddings with the image tokens replaced by the vision tower's output,
+        # as Qwen2VLForConditionalGeneration.forward builds them
+        model = self.model
+        embeds = model.model.embed_tokens(inputs.input_ids)
+        image_embeds = model.visual(
+            inputs.pixel_values.type(model.visual.get_dtype()), grid_thw=inputs.image_grid_thw
+        )
+        image_mask = (inputs.input_ids == model.config.image_token_id).unsqueeze(-1).expand_as(embeds)
+        return embeds.masked_scatter(image_mask, image_embeds.to(embeds.device, embeds.dtype))
+
+    def _ground_with_prefix(self, image, fingerprint, queries, pixels, max_new_tokens=128):
+        # Reuse the per-frame prefix and only prefill the queries' few suffix tokens.
+        # Every query shares the prefix, so all of them are decoded as one batch: the
+        # suffixes are left-padded up to the prefix and each row stops on its own.
+        # Decoding is greedy, matching the model's near-deterministic generation config.
+        import torch
+        from transformers import DynamicCache
+
+        if not queries:
+            return []
+        state = self._prefix_state(image, fingerprint, pixels)
+        tokenizer = self.processor.tokenizer
+        stop_ids = self._stop_ids()
+        device = self.model.device
+        if self.constrained:
+            max_new_tokens = min(max_new_tokens, MAX_COORDINATE_TOKENS)
+
+        suffixes = []
+        for query in queries:
+            text = self.processor.apply_chat_template(
+                self._conversation(image, query, pixels), tokenize=False, add_generation_prompt=True
+            )
+            suffix_text = text[text.index(VISION_END) + len(VISION_END):]
+            suffixes.append(tokenizer(suffix_text, add_special_tokens=False).input_ids)
+
+        batch_size = len(suffixes)
+        width = max(len(suffix) for suffix in suffixes)
+        input_ids = torch.full((batch_size, width), tokenizer.pad_token_id, dtype=torch.long)
+        suffix_mask = torch.zeros((batch_size, width), dtype=torch.long)
+        for row, suffix in enumerate(suffixes):
+            input_ids[row, width - len(suffix):] = torch.tensor(suffix)
+            suffix_mask[row, width - len(suffix):] = 1
+        input_ids, suffix_mask = input_ids.to(device), suffix_mask.to(device)
+        attention_mask = torch.cat(
+            [torch.ones((batch_size, state.length), dtype=torch.long, device=device), suffix_mask], dim=1
+        )
+        # Each row's text continues from the prefix whatever its padding; pads are masked
+        positions = state.next_position + (suffix_mask.cumsum(dim=1) - 1).clamp(min=0)
+        # A batch-sized view of the shared prefix; the decode's own tokens land in new
+        # tensors, so the cached state stays as it is for later queries
+        past_key_values = DynamicCache.from_legacy_cache(tuple(
+            (key.expand(batch_size, -1, -1, -1), value.expand(batch_size, -1, -1, -1))
+            for key, value in zip(state.past_key_values.key_cache, state.past_key_values.value_cache)
+        ))
+
+        generated = [[] for _ in queries]
+        grammar_states = [self.grammar.initial_state if self.constrained else None for _ in queries]
+        active = set(range(batch_size))
+        with torch.no_grad():
+            for _ in range(max_new_tokens):
+                outputs = self.model(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    position_ids=positions.unsqueeze(0).expand(3, -1, -1),
+                    past_key_values=past_key_values,
+                    use_cache=True,
+                )
+                logits = outputs.logits[:, -1]
+                next_ids = [tokenizer.pad_token_id] * batch_size
+                for row in sorted(active):
+                    grammar_state = grammar_states[row]
+                    if grammar_state is not None:
+                        allowed = torch.tensor(self.grammar.allowed_ids(grammar_state), device=device)
+                        next_id = int(allowed[logits[row, allowed].argmax()])
+                    else:
+                        next_id = int(logits[row].argmax())
+                    if next_id in stop_ids:
+                        active.discard(row)
+                        continue
+                    generated[row].append(next_id)
+                    next_ids[row] = next_id
+                    if grammar_state is not None:
+                        grammar_states[row] = self.grammar.step(grammar_state, next_id)
+                        if self.grammar.is_done(grammar_states[row]):
+                            # The closing bracket is out; no need to decode end-of-turn
+                            active.discard(row)
+                if not active:
+                    break
+                # Finished rows keep decoding padding alongside the others; it is never read
+                input_ids = torch.tensor(next_ids, device=device).unsqueeze(1)
+                attention_mask = torch.cat(
+                    [attention_mask, torch.ones((batch_size, 1), dtype=torch.long, device=device)], dim=1
+                )
+                positions = positions[:, -1:] + 1
+
+        output_texts = tokenizer.batch_decode(
+            generated,
+            skip_special_tokens=True,
+            clean_up_tokenization_spaces=False
+        )
+        return [self._to_coords(output_text, image) for output_text in output_texts]
+
+
+class DummyVision:
+    """
+    Stand-in with LocalVision's interface that never loads a model. It answers
+    every query with the centre of the frame; meant for tests and for exercising
+    the grounding server without a GPU.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def ground(self, image, fingerprint, queries, pixels=None):
+        return self.ground_frames([(image, fingerprint, queries, pixels)])[0]
+
+    def ground_frames(self, frames):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [
+            [[image.width // 2, image.height // 2] for _ in queries]
+            for image, _, queries, _ in frames
+        ]
+
+
+class RemoteVision:
+    """
+    Sends grounding requests to a shared grounding server (see grounding_server.py),
+    so several Frameworks on one host use a single loaded model.
+    """
+
+    def __init__(self, url, timeout=(3.05, 120), session=None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def ground(self, image, fingerprint, queries, pixels=None):
+        # Raw RGB avoids a PNG encode/decode on both ends of a loopback connection
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        response = self.session.post(
+            f"{self.url}/ground",
+            data=image.tobytes(),
+            headers={
+                "Content-Type": "application/octet-stream",
+                "X-Width": str(image.width),
+                "X-Height": str(image.height),
+                "X-Fingerprint": fingerprint,
+                "X-Queries": json.dumps(queries),
+                **({"X-Pixels": f"{pixels[0]},{pixels[1]}"} if pixels else {}),
+            },
+            timeout=self.timeout,
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Grounding server error ({response.status_code}): {response.text}")
+        return response.json()["coordinates"]
@@ -0,0 +1,103 @@
+import pytest
+
+from framework.decoding import (
+    DONE,
+    MAX_COORDINATE_TOKENS,
+    CoordinateGrammar,
+    GroundingError,
+    advance,
+    advance_text,
+    parse_coordinates,
+)
+
+START = CoordinateGrammar.initial_state
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["[0.5, 0.5]", "[0.73,0.21]", "[0, 1]", "[1.0, 0.0001]", "[0.1234, 0.9999]"],
+)
+def test_grammar_accepts_coordinates(text):
+    assert advance_text(START, text)[0] == DONE
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "0.5, 0.5]",  # no opening bracket
+        "[2.0, 0.5]",  # integer part above 1
+        "[0.12345, 0.5]",  # too many decimals
+        "[0., 0.5]",  # a point needs a decimal
+        "[.5, 0.5]",  # and an integer part
+        "[0.5 , 0.5]",  # space before the comma
+        "[0.5,  0.5]",  # two spaces after it
+        "[0.5; 0.5]",
+        "[-0.5, 0.5]",
+        "[0.5, 0.5, 0.5]",
+    ],
+)
+def test_grammar_rejects_other_text(text):
+    state = advance_text(START, text)
+    assert state is None or state[0] != DONE
+
+
+def test_nothing_follows_the_closing_bracket():
+    done = advance_text(START, "[0.5, 0.5]")
+    assert advance(done, " ") is None
+    assert advance(done, "]") is None
+
+
+def test_prefixes_of_coordinates_are_live():
+    text = "[0.25, 0.75]"
+    for end in range(1, len(text)):
+        state = advance_text(START, text[:end])
+        assert state is not None and state[0] != DONE
+
+
+def test_longest_coordinates_fit_the_token_budget():
+    # one token per character plus the end-of-turn token in the worst case
+    assert len("[0.1234, 0.1234]") + 1 <= MAX_COORDINATE_TOKENS
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("[0.5, 0.25]", (0.5, 0.25)),
+        ("The button is at [0.1,0.9].", (0.1, 0.9)),
+        ("[ 0.3 , 0.4 ]", (0.3, 0.4)),
+        ("[.5, 1]", (0.5, 1.0)),
+        # out-of-range answers are clamped to the frame
+        ("[1.5, 0.5]", (1.0, 0.5)),
+        ("[0.5, 12]", (0.5, 1.0)),
+    ],
+)
+def test_parse_coordinates(text, expected):
+    assert parse_coordinates(text) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text", ["", "no coordinates here", "[0.5]", "(0.5, 0.5)", "[-0.5, 0.5]"])
+def test_parse_coordinates_without_coordinates(text):
+    with pytest.raises(GroundingError, match="Expected coordinates"):
+        parse_coordinates(text)
+
+
+def test_grammar_tokens_skip_special_tokens():
+    pytest.importorskip("transformers")
+    from benchmarks.tiny_model import make_processor
+
+    tokenizer = make_processor().tokenizer
+    stop_ids = {tokenizer.convert_tokens_to_ids("<|im_end|>")}
+    grammar = CoordinateGrammar(tokenizer, stop_ids)
+
+    assert not set(grammar.token_text) & set(tokenizer.all_special_ids)
+    assert set("".join(grammar.token_text.values())) == set("[]0123456789., ")
+    allowed = {grammar.token_text[token_id] for token_id in grammar.allowed_ids(grammar.initial_state)}
+    assert allowed == {"["}
+
+    state = grammar.initial_state
+    for character in "[0.5, 0.5]":
+        token_id = next(i for i, text in grammar.token_text.items() if text == character)
+        assert token_id in grammar.allowed_ids(state)
+        state = grammar.step(state, token_id)
+    assert grammar.is_done(state)
+    assert grammar.allowed_ids(state) == sorted(stop_ids)
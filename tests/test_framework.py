@@ -0,0 +1,44 @@
+import pytest
+from PIL import Image
+
+from framework.framework import Framework
+from framework.vision import DummyVision
+
+
+@pytest.fixture
+def framework():
+    framework = Framework(vision=False)
+    framework.vision = DummyVision()
+    framework.FINE_WINDOW = (448, 448)
+    return framework
+
+
+def fine_region(framework, region):
+    regions = []
+    ground = framework.ground
+
+    def record(image, query, region=None, max_pixels=None):
+        regions.append(region)
+        return ground(image, query, region, max_pixels)
+
+    framework.ground = record
+    framework.ground_coarse_to_fine(Image.new("RGB", (1280, 800)), "Find the button", region)
+    return regions[1]
+
+
+def test_fine_window_is_centred_on_the_coarse_hit(framework):
+    assert fine_region(framework, None) == (416, 176, 864, 624)
+
+
+@pytest.mark.parametrize(
+    "region, expected",
+    [
+        # smaller than the window: the fine pass sees exactly the region
+        ((100, 100, 300, 250), (100, 100, 300, 250)),
+        # a strip: the window shrinks to its height and stays inside it
+        ((0, 0, 1280, 120), (416, 0, 864, 120)),
+        ((200, 50, 1000, 700), (376, 151, 824, 599)),
+    ],
+)
+def test_fine_window_stays_inside_the_region(framework, region, expected):
+    assert fine_region(framework, region) == expected
@@ -0,0 +1,126 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+from PIL import Image
+
+from framework.decoding import GroundingError
+from framework.framework import Framework
+from framework.grounding_server import GroundingServer
+from framework.vision import DummyVision, RemoteVision
+
+
+class FailingVision(DummyVision):
+    """DummyVision that fails a whole call when any frame asks for "missing"."""
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.batch_sizes = []
+
+    def ground_frames(self, frames):
+        self.batch_sizes.append(len(frames))
+        if any("missing" in queries for _, _, queries, _ in frames):
+            raise GroundingError("Expected coordinates like [0.5, 0.5] from the model, got ''")
+        return super().ground_frames(frames)
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(vision, batch_window=0.01):
+        server = GroundingServer(vision, port=0, batch_window=batch_window)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def ground_together(url, requests_):
+    # Release every request at once so they land in the same micro-batch
+    barrier = threading.Barrier(len(requests_))
+
+    def ground(request):
+        image, queries = request
+        barrier.wait()
+        try:
+            return RemoteVision(url).ground(image, f"{image.size}", queries)
+        except RuntimeError as e:
+            return e
+
+    with ThreadPoolExecutor(len(requests_)) as executor:
+        return list(executor.map(ground, requests_))
+
+
+def test_framework_grounds_through_the_server(serve):
+    url = serve(DummyVision())
+    framework = Framework(vision_url=url)
+    frame = Image.new("RGB", (1280, 800))
+
+    assert framework.vision_system("Find the search box", frame=frame) == [640, 400]
+    # coordinates in a region come back in full-frame pixels
+    assert framework.vision_system_many(
+        ["Find the back button", "Find the menu"], frame=frame, region=(640, 0, 1280, 400)
+    ) == [[960, 200], [960, 200]]
+
+
+def test_concurrent_requests_are_micro_batched(serve):
+    vision = DummyVision(latency=0.05)
+    url = serve(vision, batch_window=0.2)
+    frames = [Image.new("RGB", (100 + 10 * i, 100)) for i in range(6)]
+
+    results = ground_together(url, [(frame, ["Find the button"]) for frame in frames])
+
+    assert results == [[[frame.width // 2, 50]] for frame in frames]
+    stats = requests.get(f"{url}/stats", timeout=5).json()
+    assert stats["jobs"] == len(frames)
+    assert stats["batches"] < len(frames)
+
+
+def test_failing_job_does_not_fail_its_batch(serve):
+    vision = FailingVision()
+    url = serve(vision, batch_window=0.2)
+    frame = Image.new("RGB", (200, 100))
+
+    good, bad = ground_together(url, [(frame, ["Find the button"]), (frame, ["missing"])])
+
+    assert vision.batch_sizes[0] == 2
+    assert good == [[100, 50]]
+    assert isinstance(bad, RuntimeError)
+    assert "Expected coordinates" in str(bad)
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {"X-Width": "two"},
+        {"X-Queries": '"abc"'},
+        {"X-Queries": "5"},
+        {"X-Queries": '["Find the button", 5]'},
+        {"X-Queries": "not json"},
+        {"X-Pixels": "5"},
+        {"X-Pixels": "1,2,3"},
+        {"X-Pixels": "0,3136"},
+        {"X-Pixels": "3136,784"},
+        {"X-Pixels": "a,b"},
+    ],
+)
+def test_invalid_request_is_rejected(serve, headers):
+    vision = DummyVision()
+    url = serve(vision)
+    with requests.Session() as session:
+        response = session.post(
+            f"{url}/ground",
+            data=b"\0" * 12,
+            headers={"X-Width": "2", "X-Height": "2", "X-Queries": '["Find the button"]', **headers},
+            timeout=5,
+        )
+        assert response.status_code == 400
+        assert vision.calls == 0
+        # the connection is still usable for a valid request
+        assert RemoteVision(url, session=session).ground(Image.new("RGB", (2, 2)), "f", ["ok"]) == [[1, 1]]
@@ -0,0 +1,174 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from framework.framework import Framework
+from framework.pool import ContainerBackend, DesktopPool
+
+
+class FakeContainer:
+    def __init__(self, container_id):
+        self.id = container_id
+        self.stopped = False
+
+
+class FakeBackend(ContainerBackend):
+    """Hands out in-memory containers; stopping one twice fails like docker's NotFound."""
+
+    def __init__(self):
+        self.launched = []
+        self.ready = threading.Event()
+        self.ready.set()
+        self._ids = itertools.count(1)
+        self._ports = itertools.count(49152)
+
+    def launch(self, image_name):
+        container = FakeContainer(f"container-{next(self._ids)}")
+        self.launched.append(container)
+        return container
+
+    def host_ports(self, container):
+        return {"5000/tcp": next(self._ports), "8080/tcp": next(self._ports)}
+
+    def wait_until_ready(self, container, ready_url, timeout):
+        if not self.ready.wait(timeout):
+            raise TimeoutError(f"Container {container.id} not ready after {timeout} seconds")
+
+    def stop(self, container):
+        if container.stopped:
+            raise RuntimeError(f"No such container: {container.id}")
+        container.stopped = True
+
+    @property
+    def running(self):
+        return [container for container in self.launched if not container.stopped]
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def framework():
+    return Framework(vision=False)
+
+
+def test_warm_desktop_is_refilled_after_lease(backend, framework):
+    with DesktopPool(framework, size=3, warm=1, backend=backend) as pool:
+        wait_for(lambda: len(pool._idle) == 1)
+        assert len(backend.launched) == 1
+
+        desktop = pool.acquire()
+        assert desktop.container is backend.launched[0]
+        wait_for(lambda: len(pool._idle) == 1)
+        assert len(backend.launched) == 2
+        pool.release(desktop)
+
+
+def test_desktops_have_their_own_urls(backend, framework):
+    with DesktopPool(framework, size=2, warm=0, backend=backend) as pool:
+        first, second = pool.acquire(), pool.acquire()
+        assert first.api_url != second.api_url
+        assert first.session is not second.session
+        pool.release(first)
+        pool.release(second)
+
+
+def test_size_caps_running_desktops(backend, framework):
+    with DesktopPool(framework, size=2, warm=2, backend=backend) as pool:
+        first, second = pool.acquire(), pool.acquire()
+        with pytest.raises(TimeoutError):
+            pool.acquire(timeout=0.1)
+        assert len(backend.launched) == 2
+        pool.release(first)
+        pool.release(second)
+
+
+def test_lease_times_out_while_desktops_are_leased(backend, framework):
+    with DesktopPool(framework, size=1, warm=0, backend=backend) as pool:
+        with pool.lease():
+            with pytest.raises(TimeoutError):
+                with pool.lease(timeout=0.1):
+                    pass
+
+
+def test_waiting_lease_gets_a_released_desktop(backend, framework):
+    with DesktopPool(framework, size=1, warm=0, on_release="reuse", backend=backend) as pool:
+        desktop = pool.acquire()
+        leased = []
+        waiter = threading.Thread(target=lambda: leased.append(pool.acquire(timeout=5)))
+        waiter.start()
+        time.sleep(0.05)
+        pool.release(desktop)
+        waiter.join()
+        assert leased == [desktop]
+        pool.release(desktop)
+
+
+def test_reuse_returns_the_desktop_to_the_pool(backend, framework):
+    with DesktopPool(framework, size=1, warm=0, on_release="reuse", backend=backend) as pool:
+        with pool.lease() as desktop:
+            pass
+        assert not desktop.container.stopped
+        with pool.lease() as again:
+            assert again is desktop
+        assert len(backend.launched) == 1
+
+
+def test_recycle_retires_the_desktop_on_release(backend, framework):
+    with DesktopPool(framework, size=1, warm=1, on_release="recycle", backend=backend) as pool:
+        with pool.lease() as desktop:
+            pass
+        assert desktop.container.stopped
+        wait_for(lambda: len(pool._idle) == 1)
+        assert pool._idle[0] is not desktop
+
+
+def test_failed_boot_stops_the_container(backend, framework):
+    backend.ready.clear()
+    with DesktopPool(framework, size=1, warm=0, ready_timeout=0.05, backend=backend) as pool:
+        with pytest.raises(TimeoutError):
+            pool.acquire()
+        assert backend.launched[0].stopped
+        assert pool.total == 0
+
+
+def test_close_stops_idle_desktops(backend, framework):
+    pool = DesktopPool(framework, size=2, warm=2, backend=backend)
+    wait_for(lambda: len(pool._idle) == 2)
+    pool.close()
+    assert backend.running == []
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_close_leaves_leased_desktops_to_release(backend, framework):
+    pool = DesktopPool(framework, size=2, warm=0, backend=backend)
+    desktop = pool.acquire()
+    pool.close()
+    assert not desktop.container.stopped
+
+    pool.release(desktop)
+    assert desktop.container.stopped
+    # a second release must not stop the removed container again
+    pool.release(desktop)
+
+
+def test_reused_desktop_released_after_close_is_retired(backend, framework):
+    pool = DesktopPool(framework, size=1, warm=0, on_release="reuse", backend=backend)
+    desktop = pool.acquire()
+    pool.close()
+    pool.release(desktop)
+    assert desktop.container.stopped
+    assert len(pool._idle) == 0
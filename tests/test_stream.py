@@ -0,0 +1,162 @@
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from desktopController.tools.stream import (
+    DELTA,
+    HEADER,
+    KEYFRAME,
+    KEYFRAME_CHANGED_FRACTION,
+    TileEncoder,
+)
+from framework.stream import FrameDecoder, StreamError
+
+TILE = 64
+# neither side is a multiple of the tile size, so edge tiles are clipped
+WIDTH, HEIGHT = 200, 130
+
+
+def screen(seed=0, width=WIDTH, height=HEIGHT):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def image(frame):
+    return Image.fromarray(frame)
+
+
+def kind(message):
+    return HEADER.unpack_from(message)[0]
+
+
+def session():
+    # A keyframe, then edits in interior, edge and corner tiles
+    frames = [screen()]
+    for top, left, bottom, right in [
+        (10, 10, 20, 20),
+        (120, 190, 130, 200),  # bottom-right corner tile, clipped on both sides
+        (0, 130, 64, 200),  # right edge column
+        (70, 0, 130, 50),  # bottom edge row
+        (60, 60, 70, 70),  # four tiles around an interior corner
+    ]:
+        frame = frames[-1].copy()
+        frame[top:bottom, left:right] = 255 - frame[top:bottom, left:right]
+        frames.append(frame)
+    return frames
+
+
+def chunks(data, sizes):
+    offset = 0
+    while offset < len(data):
+        size = next(sizes)
+        yield data[offset : offset + size]
+        offset += size
+
+
+@pytest.mark.parametrize("compression", ["zlib", "none"])
+def test_round_trip_rebuilds_every_frame(compression):
+    encoder = TileEncoder(tile_size=TILE, compression=compression)
+    decoder = FrameDecoder()
+    frames = session()
+    messages = [encoder.encode(image(frame)) for frame in frames]
+
+    assert [kind(message) for message in messages] == [KEYFRAME] + [DELTA] * (len(frames) - 1)
+    for frame, message in zip(frames, messages):
+        assert len(decoder.feed(message)) == 1
+        np.testing.assert_array_equal(decoder.frame, frame)
+    np.testing.assert_array_equal(np.asarray(decoder.image()), frames[-1])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, HEADER.size, HEADER.size + 1, 4096, None])
+def test_body_can_arrive_in_any_chunk_size(chunk_size):
+    encoder = TileEncoder(tile_size=TILE)
+    frames = session()
+    stream = b"".join(encoder.encode(image(frame)) for frame in frames)
+    if chunk_size is None:
+        rng = random.Random(0)
+        sizes = iter(lambda: rng.choice([1, 3, 50, 500, 5000]), None)
+    else:
+        sizes = iter(lambda: chunk_size, None)
+
+    decoder = FrameDecoder()
+    rebuilt = []
+    for chunk in chunks(stream, sizes):
+        for _ in decoder.feed(chunk):
+            rebuilt.append(decoder.frame.copy())
+
+    assert len(rebuilt) == len(frames)
+    for got, frame in zip(rebuilt, frames):
+        np.testing.assert_array_equal(got, frame)
+    assert decoder.bytes == len(stream)
+
+
+def test_unchanged_frame_sends_nothing():
+    encoder = TileEncoder(tile_size=TILE)
+    frame = screen()
+    encoder.encode(image(frame))
+    assert encoder.encode(image(frame.copy())) is None
+
+    # no sequence number was spent on it
+    changed = frame.copy()
+    changed[0, 0] = 255 - changed[0, 0]
+    assert HEADER.unpack_from(encoder.encode(image(changed)))[2] == 1
+
+
+def test_changed_tiles_on_clipped_edges():
+    encoder = TileEncoder(tile_size=TILE)
+    previous = screen()
+    frame = previous.copy()
+    frame[HEIGHT - 1, WIDTH - 1] = 255 - frame[HEIGHT - 1, WIDTH - 1]
+
+    changed = encoder.changed_tiles(previous, frame)
+    assert changed.shape == (3, 4)
+    assert changed.sum() == 1 and changed[2, 3]
+
+
+def test_many_changed_tiles_fall_back_to_a_keyframe():
+    frame = screen()
+    tiles = TileEncoder(tile_size=TILE).changed_tiles(frame, screen(1)).size
+    at_threshold = int(tiles * KEYFRAME_CHANGED_FRACTION)
+
+    def edit(count):
+        edited = frame.copy()
+        for index in range(count):
+            row, column = divmod(index, 4)
+            edited[row * TILE, column * TILE] = 255 - edited[row * TILE, column * TILE]
+        encoder = TileEncoder(tile_size=TILE)
+        encoder.encode(image(frame))
+        return edited, encoder.encode(image(edited))
+
+    # at the threshold a delta is still sent
+    _, message = edit(at_threshold)
+    assert kind(message) == DELTA
+    assert HEADER.unpack_from(message)[6] == at_threshold
+
+    # one tile more and the whole frame is sent instead
+    edited, message = edit(at_threshold + 1)
+    assert kind(message) == KEYFRAME
+    decoder = FrameDecoder()
+    decoder.feed(message)
+    np.testing.assert_array_equal(decoder.frame, edited)
+
+
+def test_resize_and_interval_force_keyframes():
+    encoder = TileEncoder(tile_size=TILE, keyframe_interval=2)
+    frames = session()
+    kinds = [kind(encoder.encode(image(frame))) for frame in frames[:4]]
+    assert kinds == [KEYFRAME, DELTA, DELTA, KEYFRAME]
+
+    message = encoder.encode(image(screen(width=WIDTH + 10)))
+    assert kind(message) == KEYFRAME
+    decoder = FrameDecoder()
+    decoder.feed(message)
+    assert decoder.frame.shape == (HEIGHT, WIDTH + 10, 3)
+
+
+def test_delta_before_keyframe_is_rejected():
+    encoder = TileEncoder(tile_size=TILE)
+    frames = session()
+    encoder.encode(image(frames[0]))
+    with pytest.raises(StreamError):
+        FrameDecoder().feed(encoder.encode(image(frames[1])))